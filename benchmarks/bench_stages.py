@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Times each stage of building clusters on synthetic data, saves times to json.
+
+Run from root folder of repository:
+    python benchmarks/bench_stages.py --sizes 200 3000 --output bench.json
+
+Created on Sat Oct 17 21:52:44 2026
+
+@author: Anna Kravets
+"""
+import argparse
+from datetime import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clust.clusters_builder import (get_edge_list, labels_to_clusters,
+                                    normalize_data, rank_labels,
+                                    write_labels)
+from clust.graphs import MST, MST_delaunay, MST_knn, MST_prim
+from clust.inspection import Inspector
+from clust.results_store import RECORD_DTYPE, ResultsStore
+import dsj_set
+import numpy as np
+import pandas as pd
+
+from legacy import sort_clusters
+import synthetic
+
+SIZES = [200, 3000, 20000, 100000]
+N_FEATURES = [2, 3]
+
+
+def time_stage(func, repeats):
+    """
+    Call func several times, measure wall time of each call.
+
+    Args:
+        func (callable): stage to time, called without arguments.
+        repeats (int): # of calls.
+
+    Returns
+    -------
+        result: value returned by last call.
+        dict: min and median time in seconds, # of calls.
+
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, {'seconds_min': min(times),
+                    'seconds_median': float(np.median(times)),
+                    'repeats': repeats}
+
+
+def run_size(n_units, n_features, args):
+    """
+    Time all stages on synthetic data of given size.
+
+    Args:
+        n_units (int): # of admin units.
+        n_features (int): # of features.
+        args (argparse.Namespace): options of benchmark.
+
+    Returns
+    -------
+        list: dict for each stage: stage, n_units, n_features and times or
+        reason to skip the stage.
+
+    """
+    records = []
+
+    def run(stage, func, skip=None):
+        record = {'stage': stage, 'n_units': n_units,
+                  'n_features': n_features}
+        if skip:
+            record['skipped'] = skip
+            records.append(record)
+            print(n_units, n_features, stage, 'skipped:', skip)
+            return None
+        result, times = time_stage(func, args.repeats)
+        record.update(times)
+        records.append(record)
+        print(n_units, n_features, stage, times['seconds_min'])
+        return result
+
+    with tempfile.TemporaryDirectory() as folder:
+        run_stages(run, n_units, n_features, args, folder)
+    return records
+
+
+def run_stages(run, n_units, n_features, args, folder):
+    """
+    Time all stages on synthetic data of given size, files are kept in folder.
+
+    Args:
+        run (callable): times stage and records result, see run_size.
+        n_units (int): # of admin units.
+        n_features (int): # of features.
+        args (argparse.Namespace): options of benchmark.
+        folder (str): temporary folder for data file, caches and results.
+
+    Returns
+    -------
+        None.
+
+    """
+    info_file = os.path.join(folder, 'data.csv')
+    synthetic.make_frame(n_units, n_features, seed=args.seed).to_csv(
+        info_file, index=False)
+    loader_class = synthetic.get_loader_class(n_features)
+    n_cold = [0]
+
+    def load_cold():
+        # new empty cache folder on each call: csv is parsed, cache is saved
+        n_cold[0] += 1
+        return get_file_loader_class(
+            loader_class, info_file,
+            os.path.join(folder, 'cold{}'.format(n_cold[0])))()
+
+    run('load_cold', load_cold)
+    warm_class = get_file_loader_class(loader_class, info_file,
+                                       os.path.join(folder, 'cache'))
+    warm_class()
+    loader = run('load_warm', warm_class)
+    date = format(loader.dates[-1], loader.DATE_FORMAT)
+    data = run('extract_data', lambda: loader.extract_data(date))
+    n_vert = data.shape[0]
+    data_norm = run('normalize_data', lambda: normalize_data(
+        data.loc[:, loader.COLUMN_LIST]))
+
+    quadratic = n_vert > args.max_quadratic and \
+        'n_vert > max_quadratic={}'.format(args.max_quadratic)
+    edge_list = run('get_edge_list', lambda: get_edge_list(data_norm),
+                    skip=quadratic)
+    run('MST_kruskal', lambda: MST(edge_list, n_vert), skip=quadratic)
+    del edge_list
+    run('MST_prim', lambda: MST_prim(data_norm.values),
+        skip=n_vert > args.max_prim and
+        'n_vert > max_prim={}'.format(args.max_prim))
+    tree = run('MST_delaunay', lambda: MST_delaunay(data_norm.values))
+    run('MST_knn', lambda: MST_knn(data_norm.values, args.knn_k))
+
+    edge_list_trunc = run('delete_edges_local', lambda: Inspector(
+        tree).delete_edges_local(mu=args.mu, ratio_threshold=args.ratio))
+
+    def union_legacy():
+        components = dsj_set.DisjointSets(n_vert)
+        for edge in edge_list_trunc.tolist():
+            components.union(edge[0], edge[1])
+        return components.get_all_sets()
+
+    def union_array():
+        components = dsj_set.DisjointSetsArray(n_vert)
+        components.union_many(edge_list_trunc)
+        return components.labels()
+
+    clusters = run('DisjointSets_union', union_legacy)
+    labels = run('DisjointSetsArray_union_many', union_array)
+
+    run('sort_clusters', lambda: sort_clusters(
+        clusters, data_norm, col_name=loader.MAIN_COLUMN))
+    ids = data[loader.ID_COLUMN].to_numpy()
+    values = data[loader.MAIN_COLUMN].values
+    labels = run('rank_labels', lambda: rank_labels(labels, values))
+    run('labels_to_clusters', lambda: labels_to_clusters(ids, labels))
+
+    csv_file = os.path.join(folder, 'clust.csv')
+    run('save_clusters_csv',
+        lambda: write_labels(ids, labels, date, csv_file))
+
+    def save_store():
+        with ResultsStore(os.path.join(folder, 'clust.bin')) as store:
+            write_labels(ids, labels, date, store)
+    max_label = np.iinfo(RECORD_DTYPE['cluster']).max
+    run('save_clusters_store', save_store,
+        skip=labels.max() > max_label and
+        '{} clusters > {} stored per date'.format(labels.max() + 1,
+                                                  max_label + 1))
+
+    try:
+        import visualization
+    except ImportError as error:
+        run('modify_geo_json', None, skip='import failed: {}'.format(error))
+        return
+    map_builder = make_map_builder(visualization, loader, folder)
+    data_map = data.set_index(loader.ID_COLUMN)
+    data_map[map_builder.clust_column] = labels + 1
+    run('modify_geo_json', lambda: map_builder.modify_geo_json(data_map))
+
+
+
+
+def get_file_loader_class(loader_class, info_file, cache_folder):
+    """
+    Get subclass of synthetic loader that reads csv file and caches tensor.
+
+    Args:
+        loader_class (type): class returned by synthetic.get_loader_class.
+        info_file (str): path of csv file with synthetic data.
+        cache_folder (str): folder of .npy cache.
+
+    Returns
+    -------
+        type: subclass of loader_class.
+
+    """
+    return type(loader_class.__name__, (loader_class,), {
+        'INFO_FILE': info_file, 'CACHE_FOLDER': cache_folder})
+
+
+def make_map_builder(visualization, loader, folder):
+    """
+    Build MapBuilder whose admin units are squares of synthetic data.
+
+    Boundaries are kept in geometry cache as for real maps.
+
+    Args:
+        visualization (module): imported visualization module.
+        loader (Loader): synthetic loader, its units get squares.
+        folder (str): folder of results store.
+
+    Returns
+    -------
+        visualization.MapBuilder: map builder.
+
+    """
+    class SyntheticMapBuilder(visualization.MapBuilder):
+
+        def __init__(self):
+            self.id_json = 'geoid'
+            self.name_json = 'name'
+            self.id_df = loader.ID_COLUMN
+            self.column_list = loader.COLUMN_LIST
+            self.map_folder = os.path.join(folder, 'html')
+            self.img_folder = os.path.join(folder, 'pictures')
+            self.map_args = {'location': [0, 0], 'zoom_start': 1}
+            self.file_clust = os.path.join(folder, 'map_clust.bin')
+            visualization.MapBuilder.__init__(self)
+
+        def get_geo_source(self):
+            return 'synthetic:{}'.format(loader.source_hash)
+
+        def read_geo_json(self):
+            return synthetic.make_geo_json(loader.unit_ids)
+
+    return SyntheticMapBuilder()
+
+
+def get_meta():
+    """
+    Get info about environment in which benchmark is run.
+
+    Returns
+    -------
+        dict: time, versions of python and libraries, commit of repository.
+
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {'time': dt.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'commit': commit or None}
+
+
+def main():
+    """
+    Parse arguments, run benchmark, save results to json file.
+
+    Returns
+    -------
+        None.
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--features', type=int, nargs='+',
+                        default=N_FEATURES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-quadratic', type=int, default=5000,
+                        help='skip stages on full list of edges above it')
+    parser.add_argument('--max-prim', type=int, default=20000)
+    parser.add_argument('--knn-k', type=int, default=10)
+    parser.add_argument('--mu', type=float, default=10)
+    parser.add_argument('--ratio', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    records = []
+    for n_units in args.sizes:
+        for n_features in args.features:
+            records += run_size(n_units, n_features, args)
+    with open(args.output, 'w') as output:
+        json.dump({'meta': get_meta(), 'options': vars(args),
+                   'results': records}, output, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Reference implementations that the pipeline has replaced, kept for timing.
+
+sort_clusters and get_rank rank clusters as sets of data points, as
+clust.clusters_builder did before rank_labels.
+
+Created on Sat Oct 17 03:05:21 2026
+"""
+
+
+def sort_clusters(clusters, data, col_name='New cases'):
+    """
+    Sort clusters on avg number of new cases, ascending order.
+
+    Args:
+        clusters (list): contains sets, each set stores ids of admin units that
+        form a cluster.
+        data (pandas.DataFrame): contains normalized indicators for all admin
+        units.
+        col_name (str): name of column, to take data for calculating rank.
+        Defaults to 'New cases' (for countries sort).
+
+    Returns
+    -------
+        list: contains sets(clusters), sorted.
+
+    """
+    return sorted(clusters, key=lambda cluster: get_rank(cluster,
+                                                         data, col_name))
+
+
+def get_rank(cluster, data, col_name):
+    """
+    Calculate a measure on which clusters could be sorted.
+
+    Args:
+        cluster (set): stores ids of admin units that form a cluster.
+        data (pandas.DataFrame): contains normalized indicators for all admin
+        units.
+        col_name (str): name of column, to take data for calculating rank.
+
+    Returns
+    -------
+        float: average value of indicator giben by col_name (after
+        it was normalized)
+        for units from the given cluster.
+
+    """
+    return data.iloc[list(cluster)][col_name].mean()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Generates synthetic data in the format of Loader's INFO_FILE.
+
+Created on Sat Oct 17 21:37:02 2026
+
+@author: Anna Kravets
+"""
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+from loader import Loader
+
+FEATURE_COLUMNS = ['Confirmed', 'Deaths', 'Recovered']
+
+
+def get_loader_class(n_features):
+    """
+    Get Loader subclass that reads synthetic data with n_features columns.
+
+    Args:
+        n_features (int): # of features, 1..len(FEATURE_COLUMNS).
+
+    Returns
+    -------
+        type: subclass of Loader.
+
+    """
+    return type('SyntheticLoader{}'.format(n_features), (Loader,), {
+        'DATE_FORMAT_INTERNAL': '%Y-%m-%d',
+        'ID_COLUMN': 'UID',
+        'COLUMN_LIST': FEATURE_COLUMNS[:n_features],
+        'MAIN_COLUMN': FEATURE_COLUMNS[0]})
+
+
+def make_frame(n_units, n_features=2, n_dates=2, n_blobs=8,
+               missing_ratio=0.05, seed=0):
+    """
+    Generate data on all dates, as in INFO_FILE.
+
+    Units are split in blobs with log-normal counts (as counties of
+    different size), a share of units has zero counts (duplicated data
+    points), a share of rows is missing.
+
+    Args:
+        n_units (int): # of admin units.
+        n_features (int, optional): # of feature columns. Defaults to 2.
+        n_dates (int, optional): # of dates. Defaults to 2.
+        n_blobs (int, optional): # of groups of similar units. Defaults to 8.
+        missing_ratio (float, optional): share of missing rows. Defaults to
+            0.05.
+        seed (int, optional): seed of random generator. Defaults to 0.
+
+    Returns
+    -------
+        pandas.DataFrame: columns Date, UID and feature columns.
+
+    """
+    rng = np.random.default_rng(seed)
+    blob = rng.integers(n_blobs, size=n_units)
+    centers = rng.normal(3, 1.5, size=(n_blobs, n_features))
+    frames = []
+    for k in range(n_dates):
+        log_counts = centers[blob] + rng.normal(0, 0.5,
+                                                size=(n_units, n_features))
+        counts = np.floor(np.expm1(np.maximum(log_counts, 0)))
+        counts[rng.random(n_units) < 0.1] = 0
+        frame = pd.DataFrame(counts, columns=FEATURE_COLUMNS[:n_features])
+        frame.insert(0, 'UID', np.arange(n_units, dtype=np.int64) + 84000000)
+        frame.insert(0, 'Date', format(date(2020, 3, 1) + timedelta(days=k),
+                                       '%Y-%m-%d'))
+        frames.append(frame[rng.random(n_units) >= missing_ratio])
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_geo_json(ids):
+    """
+    Generate GeoJson data with a square for each admin unit.
+
+    Args:
+        ids (numpy.ndarray): ids of admin units.
+
+    Returns
+    -------
+        dict: GeoJson FeatureCollection, feature has 'geoid' and 'name'
+        properties.
+
+    """
+    side = int(np.ceil(np.sqrt(max(len(ids), 1))))
+    features = []
+    for k, id_ in enumerate(np.asarray(ids).tolist()):
+        x, y = k % side, k // side
+        features.append({
+            'type': 'Feature',
+            'properties': {'geoid': id_, 'name': str(id_)},
+            'geometry': {'type': 'Polygon', 'coordinates': [[
+                [x, y], [x+1, y], [x+1, y+1], [x, y+1], [x, y]]]}})
+    return {'type': 'FeatureCollection', 'features': features}
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 """
-ClustersBuilder is a class for building clusters.
+ClustersBuilder builds clusters, ResultsStore stores them, Profiler times them.
 
 Created on Thu Sep 10 13:21:01 2020
 
 @author: Anna Kravets
 """
-from clust.clusters_builder import ClustersBuilder
\ No newline at end of file
+from clust.clusters_builder import ClustersBuilder
+from clust.profiling import Profiler
+from clust.results_store import ResultsStore
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Class that caches clusters in memory and on disk.
+
+Created on Sat Oct 17 18:12:09 2026
+
+@author: Anna Kravets
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import numpy as np
+import os
+
+
+class LabelsCache:
+    """Stores clusters built by ClustersBuilder.get_labels.
+
+    Recently used results are kept in memory (least recently used are
+    evicted first), all results are also saved on disk in .npz files named
+    by hash of key, so that they are reused by other processes and runs.
+    When disk cache grows over max_disk_bytes, files that have not been used
+    for the longest time are deleted.
+
+    Attributes
+    ----------
+        folder (str): folder with .npz files.
+        max_items (int): # of results kept in memory.
+        max_disk_bytes (int): total size of .npz files.
+        memory (collections.OrderedDict): maps hash of key to result, least
+        recently used first.
+        hits (int): # of results found in cache.
+        misses (int): # of results not found in cache.
+    """
+
+    FOLDER = 'data/cache/clusters'
+
+    def __init__(self, folder=FOLDER, max_items=256, max_disk_bytes=1 << 28):
+        """
+        Create empty memory cache, disk cache is kept as is.
+
+        Args:
+            folder (str, optional): folder with .npz files. Defaults to
+                FOLDER.
+            max_items (int, optional): # of results kept in memory. Defaults
+                to 256.
+            max_disk_bytes (int, optional): total size of .npz files.
+                Defaults to 256 MB.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.folder = folder
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits, self.misses = 0, 0
+
+    def get_path(self, key_hash):
+        """
+        Get path of .npz file for hash of key.
+
+        Args:
+            key_hash (str): hash of key.
+
+        Returns
+        -------
+            str: path of .npz file.
+
+        """
+        return os.path.join(self.folder, key_hash + '.npz')
+
+    def get(self, key):
+        """
+        Look up result in memory, then on disk.
+
+        Args:
+            key (list): json-serializable values that identify result.
+
+        Returns
+        -------
+            tuple: (ids, labels) or None if result is not in cache, arrays
+            are copies, so that caller could change them.
+
+        """
+        key_hash = get_key_hash(key)
+        if key_hash in self.memory:
+            self.memory.move_to_end(key_hash)
+            self.hits += 1
+            return tuple(array.copy() for array in self.memory[key_hash])
+        path = self.get_path(key_hash)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                value = (arrays['ids'], arrays['labels'])
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.remember(key_hash, value)
+        return tuple(array.copy() for array in value)
+
+    def put(self, key, ids, labels):
+        """
+        Save result in memory and on disk.
+
+        Copies of arrays are kept in memory, so that caller could change
+        them.
+
+        Args:
+            key (list): json-serializable values that identify result.
+            ids (numpy.ndarray): ids of admin units.
+            labels (numpy.ndarray): id of cluster for each admin unit.
+
+        Returns
+        -------
+            None.
+
+        """
+        ids = np.array(ids)
+        if ids.dtype == object:
+            ids = ids.astype(str)
+        labels = np.array(labels)
+        key_hash = get_key_hash(key)
+        self.remember(key_hash, (ids, labels))
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.get_path(key_hash)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as cache_file:
+            np.savez_compressed(cache_file, ids=ids, labels=labels)
+        os.replace(tmp_path, path)
+        self.evict_disk()
+
+    def remember(self, key_hash, value):
+        """
+        Save result in memory, evict least recently used results.
+
+        Args:
+            key_hash (str): hash of key.
+            value (tuple): (ids, labels).
+
+        Returns
+        -------
+            None.
+
+        """
+        self.memory[key_hash] = value
+        self.memory.move_to_end(key_hash)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def evict_disk(self):
+        """
+        Delete least recently used .npz files until cache fits in size.
+
+        Returns
+        -------
+            None.
+
+        """
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.npz'):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def get_key_hash(key):
+    """
+    Get sha1 hash of key.
+
+    Args:
+        key (list): json-serializable values that identify result.
+
+    Returns
+    -------
+        str: hex digest.
+
+    """
+    return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
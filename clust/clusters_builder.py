@@ -6,13 +6,22 @@ Created on Fri Aug 14 10:54:34 2020
 
 @author: Anna Kravets
 """
-from clust.graphs import MST, build_edge
+from clust.cache import LabelsCache
+from clust.distances import edge_indices, pairwise_distances
+from clust.dendrogram import Dendrogram
+from clust.edges import as_edges, make_edges
+from clust.graphs import (MST, MST_adjacency, MST_delaunay, MST_knn,
+                          MST_prim, count_tree_diff, update_MST)
 from clust.inspection import Inspector
+from clust.profiling import NULL_PROFILER
+from clust.results_store import ResultsStore
 import dsj_set
 from functools import partial
+import hashlib
 from multiprocessing import Pool
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 class ClustersBuilder:
     """Divides data points in clusters.
@@ -26,29 +35,114 @@ class ClustersBuilder:
         stores data with features of data points. loader.LoaderUS should be
         used for building clusters for US counties. loader.LoaderCountries -
         for building clusters for countries.
+    mst_backend: str
+        algorithm used to build Minimum Spanning Tree, one of MST_BACKENDS.
+        'kruskal' sorts a full list of edges, 'prim' computes weights row by
+        row and never stores a full list of edges, 'delaunay' inspects only
+        edges of Delaunay triangulation (fit for 2-3 features and many data
+        points). 'kruskal' and 'prim' break ties of weights by ends of edges
+        and build the same tree. 'delaunay' builds a tree of the same weight
+        that could differ on ties, and then clusters could differ too.
+        'knn' builds approximate tree on k-nearest-neighbour graph (fit for
+        many data points, see compare_knn for choosing k). 'adjacency'
+        builds minimum spanning forest on edges between geographically
+        adjacent admin units only, so that clusters are contiguous regions;
+        units that are not in adjacency are labeled -1 (see get_clustered).
+    knn_k: int
+        # of nearest neighbours of each data point for 'knn' backend.
+    adjacency: tuple
+        (unit_ids, sparse matrix) for 'adjacency' backend, as returned by
+        visualization.MapBuilder.get_adjacency, None for other backends.
+    adjacency_hash: str
+        hash of adjacency for cache key, computed on first use.
+    incremental: bool
+        if True, tree built on previous date is kept and updated for data
+        points whose raw features have changed (or that have been added or
+        removed), instead of building tree from scratch. Features are then
+        normalized with mean and std frozen on the date when tree was last
+        built from scratch, so clusters are approximate: they could differ
+        from clusters built on features normalized on each date.
+    max_change_ratio: float
+        in incremental mode tree is built from scratch (and normalization is
+        frozen again) if share of changed data points is greater than
+        max_change_ratio.
+    mu, ratio_threshold: float
+        parameters of Inspector.delete_edges_local. mu=10, ratio=5 fit US
+        counties, mu=5, ratio=2.5 fit countries.
+    cache: clust.cache.LabelsCache
+        stores clusters that have been built, keyed by data, date and
+        parameters of builder (see get_cache_key). None if caching is off,
+        not used in incremental mode.
+    profiler: clust.profiling.Profiler
+        measures stages of building clusters, NULL_PROFILER if profiling is
+        off.
 
     """
 
-    def __init__(self, loader):
+    MST_BACKENDS = ('kruskal', 'prim', 'delaunay', 'knn', 'adjacency')
+
+    def __init__(self, loader, mst_backend='kruskal', incremental=False,
+                 max_change_ratio=0.1, mu=10, ratio_threshold=5,
+                 cache=None, profiler=None, knn_k=10, adjacency=None):
         """
         Set up Loader.
 
         Args:
             loader (Loader): stores data.
+            mst_backend (str, optional): one of MST_BACKENDS. Defaults to
+                'kruskal'.
+            incremental (bool, optional): whether to update tree built on
+                previous date. Defaults to False.
+            max_change_ratio (float, optional): max share of changed data
+                points for which tree is updated. Defaults to 0.1.
+            mu (float, optional): # of stds for deleting inconsistent
+                edges. Defaults to 10.
+            ratio_threshold (float, optional): ratio of weight to avg for
+                deleting inconsistent edges. Defaults to 5.
+            cache (LabelsCache or bool, optional): cache of clusters, True
+                for LabelsCache with default settings. Defaults to None (no
+                caching).
+            profiler (Profiler, optional): measures stages of building
+                clusters. Defaults to None (no profiling).
+            knn_k (int, optional): # of nearest neighbours for 'knn'
+                backend. Defaults to 10.
+            adjacency (tuple, optional): ids of admin units and sparse
+                matrix of their adjacency, required for 'adjacency' backend
+                (which is not incremental). Defaults to None.
 
         Returns
         -------
           None.
 
         """
+        if mst_backend not in self.MST_BACKENDS:
+            raise ValueError('Unknown MST backend: {}'.format(mst_backend))
+        if mst_backend == 'adjacency' and (adjacency is None or incremental):
+            raise ValueError('adjacency backend needs adjacency and is not '
+                             'incremental')
         self.loader = loader
+        self.mst_backend = mst_backend
+        self.incremental = incremental
+        self.max_change_ratio = max_change_ratio
+        self.previous = None
+        self.dendrograms = dict()
+        self.mu = mu
+        self.ratio_threshold = ratio_threshold
+        self.cache = LabelsCache() if cache is True else cache or None
+        self.profiler = profiler or NULL_PROFILER
+        self.knn_k = knn_k
+        self.adjacency = adjacency
+        self.adjacency_index = None if adjacency is None \
+            else pd.Index(adjacency[0])
+        self.adjacency_hash = None
 
     def build_clusters_from_edge_list(self, edge_list, n_vert):
         """
         Build clusters as joint components of graph built on given edge_list.
 
         Args:
-            edge_list (list): list with triples of weighted edges:
+            edge_list (numpy.ndarray or list): edge array (see clust.edges) or
+                list with triples of weighted edges:
                 (from vert, to vert, weight).
             n_vert (int): number of vertices.
 
@@ -57,20 +151,313 @@ class ClustersBuilder:
             list: contains sets that have been formed, set=cluster.
 
         """
-        components = dsj_set.DisjointSets(n_vert)
-        for edge in edge_list:
-            from_vert, to_vert = edge[0], edge[1]
-            components.union(from_vert, to_vert)
+        components = dsj_set.DisjointSetsArray(n_vert)
+        components.union_many(as_edges(edge_list))
         return components.get_all_sets()
 
-    def get_clusters(self, date, n_clusters=5):
+    def build_tree(self, data_norm, ids=None):
+        """
+        Build Minimum Spanning Tree of a full graph built on given data.
+
+        Args:
+            data_norm (pandas.DataFrame): contains normalized features of each
+                data point.
+            ids (numpy.ndarray, optional): ids of data points, required for
+                'adjacency' backend. Defaults to None.
+
+        Returns
+        -------
+            numpy.ndarray: edge array, contains edges of minimum spanning
+            tree, sorted by weight.
+
+        """
+        if self.mst_backend == 'prim':
+            return MST_prim(data_norm.values)
+        if self.mst_backend == 'delaunay':
+            return MST_delaunay(data_norm.values)
+        if self.mst_backend == 'knn':
+            return MST_knn(data_norm.values, self.knn_k)
+        if self.mst_backend == 'adjacency':
+            adjacency = self.get_adjacency(ids)
+            self.profiler.count('edges', adjacency.nnz // 2)
+            return MST_adjacency(data_norm.values, adjacency)
+        with self.profiler.stage('edge_list'):
+            edge_list = get_edge_list(data_norm)
+        self.profiler.count('edges', edge_list.shape[0])
+        with self.profiler.stage('kruskal'):
+            return MST(edge_list, data_norm.shape[0])
+
+    def get_tree(self, data, ids):
+        """
+        Build Minimum Spanning Tree, update previous one in incremental mode.
+
+        Features are normalized on each date, in incremental mode they are
+        normalized with mean and std of the date when tree was last built
+        from scratch.
+
+        Args:
+            data (pandas.DataFrame): contains features of each data point.
+            ids (numpy.ndarray): ids of data points.
+
+        Returns
+        -------
+            numpy.ndarray: edge array, contains edges of minimum spanning
+            tree, sorted by weight.
+
+        """
+        edge_list_tree = None
+        if self.incremental and self.previous is not None:
+            scale = self.previous[3]
+            with self.profiler.stage('normalize'):
+                data_norm = normalize_data(data, scale)
+            features = data_norm.values.astype(np.float64)
+            with self.profiler.stage('update_tree'):
+                edge_list_tree = self.update_tree(features, ids)
+        if edge_list_tree is None:
+            with self.profiler.stage('normalize'):
+                scale = get_scale(data)
+                data_norm = normalize_data(data, scale)
+            features = data_norm.values.astype(np.float64)
+            with self.profiler.stage('build_tree'):
+                edge_list_tree = self.build_tree(data_norm, ids)
+        if self.incremental:
+            self.previous = (ids, features, edge_list_tree, scale)
+        self.profiler.count('mst_edges', edge_list_tree.shape[0])
+        return edge_list_tree
+
+    def get_adjacency(self, ids):
+        """
+        Get adjacency of data points with given ids.
+
+        Data points whose ids are not in adjacency have no neighbours.
+
+        Args:
+            ids (numpy.ndarray): ids of data points.
+
+        Returns
+        -------
+            scipy.sparse.csr_matrix: (n_vert, n_vert) matrix, nonzero for
+            adjacent data points.
+
+        """
+        rows = self.adjacency_index.get_indexer(ids)
+        present = np.flatnonzero(rows >= 0)
+        adjacency = sparse.csr_matrix(self.adjacency[1])
+        adjacency = adjacency[rows[present]][:, rows[present]].tocoo()
+        return sparse.csr_matrix(
+            (adjacency.data, (present[adjacency.row], present[adjacency.col])),
+            shape=(ids.shape[0], ids.shape[0]))
+
+    def get_clustered(self, ids):
+        """
+        Get data points that are divided in clusters.
+
+        With 'adjacency' backend admin units that are not in adjacency (e.g.
+        have no geometry) could not be joined with any other unit, they are
+        left out of clusters and labeled -1, so that they are not ranked
+        among clusters and do not take clusters from n_clusters. Other
+        backends divide all data points.
+
+        Args:
+            ids (numpy.ndarray): ids of data points.
+
+        Returns
+        -------
+            numpy.ndarray: boolean array, True for data points that are
+            divided in clusters.
+
+        """
+        if self.mst_backend != 'adjacency':
+            return np.ones(ids.shape[0], dtype=bool)
+        return self.adjacency_index.get_indexer(ids) >= 0
+
+    def update_tree(self, features, ids):
+        """
+        Update tree built on previous date.
+
+        Normalization is the same as on previous date, so data points whose
+        normalized features have changed are those whose raw features have
+        changed.
+
+        Args:
+            features (numpy.ndarray): normalized features of each data point.
+            ids (numpy.ndarray): ids of data points.
+
+        Returns
+        -------
+            numpy.ndarray or None: edge array of minimum spanning tree, None
+            if too many data points have changed.
+
+        """
+        prev_ids, prev_features, prev_tree, _ = self.previous
+        new_index = pd.Index(ids).get_indexer(prev_ids)
+        kept = new_index >= 0
+        changed = np.ones(ids.shape[0], dtype=bool)
+        changed[new_index[kept]] = np.any(
+            features[new_index[kept]] != prev_features[kept], axis=1)
+        n_changed = np.sum(changed) + np.sum(~kept)
+        if n_changed > self.max_change_ratio*ids.shape[0]:
+            return None
+        from_vert = new_index[prev_tree['from_vert']]
+        to_vert = new_index[prev_tree['to_vert']]
+        in_forest = (from_vert >= 0) & (to_vert >= 0)
+        in_forest[in_forest] = ~changed[from_vert[in_forest]] & \
+            ~changed[to_vert[in_forest]]
+        edge_list_forest = make_edges(
+            np.minimum(from_vert, to_vert)[in_forest],
+            np.maximum(from_vert, to_vert)[in_forest],
+            prev_tree['weight'][in_forest])
+        return update_MST(features, edge_list_forest, changed)
+
+    def get_dendrogram(self, date):
+        """
+        Get single-linkage merge tree built on data on a particular date.
+
+        Merge tree is built once per date and cached.
+
+        Args:
+            date (str): format as in DATE_FORMAT.
+
+        Returns
+        -------
+            Dendrogram: merge tree, data points are numbered as rows of
+            loader.extract_data(date) that are divided in clusters (see
+            get_clustered).
+
+        """
+        if date not in self.dendrograms:
+            data = self.loader.extract_data(date)
+            data = data[self.get_clustered(data[self.loader.ID_COLUMN].values)]
+            edge_list_tree = self.get_tree(
+                data.loc[:, self.loader.COLUMN_LIST],
+                data[self.loader.ID_COLUMN].values)
+            with self.profiler.stage('dendrogram'):
+                self.dendrograms[date] = Dendrogram(edge_list_tree,
+                                                    data.shape[0])
+        return self.dendrograms[date]
+
+    def get_labels(self, date, n_clusters=None):
+        """
+        Divide admin units in clusters, return cluster id of each unit.
+
+        Result is taken from cache, if it has been built before. Cache is
+        not used in incremental mode, as clusters then depend on dates that
+        have been processed before.
+
+        Args:
+        ----
+            date (string): format as in DATE_FORMAT.
+            n_clusters (int, optional): # of clusters to build, cut from
+                cached merge tree. If None, # of clusters is deduced
+                automatically by deleting inconsistent edges. Defaults to
+                None.
+
+        Return
+        ------
+            ids (numpy.ndarray): ids of admin units.
+            labels (numpy.ndarray): id of cluster for each admin unit
+            (clusters are numbered 0..n_clusters-1 by average num of new
+             cases in cluster, ascending order, -1 for units that are not
+             divided in clusters, see get_clustered).
+
+        """
+        if self.cache is None or self.incremental:
+            return self.build_labels(date, n_clusters)
+        key = self.get_cache_key(date, n_clusters)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.build_labels(date, n_clusters)
+            self.cache.put(key, *result)
+        return result
+
+    def build_labels(self, date, n_clusters=None):
+        """
+        Divide admin units in clusters, cache is not used.
+
+        Args:
+        ----
+            date (string): format as in DATE_FORMAT.
+            n_clusters (int, optional): # of clusters to build. Defaults to
+                None.
+
+        Return
+        ------
+            tuple: same as get_labels.
+
+        """
+        profiler = self.profiler
+        profiler.set_context(date=date)
+        with profiler.stage('extract_data'):
+            data = self.loader.extract_data(date)
+        profiler.count('units', data.shape[0])
+        ids = data[self.loader.ID_COLUMN].to_numpy()
+        clustered = self.get_clustered(ids)
+        data = data[clustered]
+        if n_clusters is not None:
+            dendrogram = self.get_dendrogram(date)
+            with profiler.stage('cut'):
+                labels = dendrogram.labels(n_clusters)
+        else:
+            n_vert = data.shape[0]
+            edge_list_tree = self.get_tree(
+                data.loc[:, self.loader.COLUMN_LIST],
+                data[self.loader.ID_COLUMN].values)
+            with profiler.stage('inspect'):
+                inspector = Inspector(edge_list_tree, n_vert)
+                edge_list_trunc = inspector.delete_edges_local(
+                    mu=self.mu, ratio_threshold=self.ratio_threshold)
+            profiler.count('deleted_edges', edge_list_tree.shape[0] -
+                           edge_list_trunc.shape[0])
+            with profiler.stage('union'):
+                components = dsj_set.DisjointSetsArray(n_vert)
+                components.union_many(edge_list_trunc)
+                labels = components.labels()
+        with profiler.stage('rank'):
+            labels = rank_labels(labels, data[self.loader.MAIN_COLUMN].values)
+        profiler.count('clusters', labels.max(initial=-1) + 1)
+        labels_all = np.full(ids.shape[0], -1, dtype=labels.dtype)
+        labels_all[clustered] = labels
+        return ids, labels_all
+
+    def get_cache_key(self, date, n_clusters=None):
+        """
+        Get values that identify clusters built on given date.
+
+        Args:
+            date (str): format as in DATE_FORMAT.
+            n_clusters (int, optional): # of clusters to build. Defaults to
+                None.
+
+        Returns
+        -------
+            list: data key of loader, date, MST backend (with k for 'knn',
+            hash of adjacency for 'adjacency'), parameters of deleting
+            inconsistent edges (if n_clusters is None) and n_clusters.
+
+        """
+        backend = [self.mst_backend]
+        if self.mst_backend == 'knn':
+            backend.append(self.knn_k)
+        if self.mst_backend == 'adjacency':
+            if self.adjacency_hash is None:
+                self.adjacency_hash = get_adjacency_hash(*self.adjacency)
+            backend.append(self.adjacency_hash)
+        params = [self.mu, self.ratio_threshold] if n_clusters is None \
+            else []
+        return self.loader.get_data_key() + [date] + backend + params + \
+            [n_clusters]
+
+    def get_clusters(self, date, n_clusters=None):
         """
         Divide admin units in clusters using data on a particular date.
 
         Args:
         ----
             date (string): format as in DATE_FORMAT.
-            n_clusters (int, optional): # of clusters to build. Defaults to 5.
+            n_clusters (int, optional): # of clusters to build, cut from
+                cached merge tree. If None, # of clusters is deduced
+                automatically by deleting inconsistent edges. Defaults to
+                None.
 
         Return
         ------
@@ -78,126 +465,379 @@ class ClustersBuilder:
             distinct cluster (clusters are sorted by average num of new cases
                               in cluster, ascending order).
 
+        """
+        return labels_to_clusters(*self.get_labels(date, n_clusters))
+
+    def sweep_local(self, date, mu_list, ratio_list):
+        """
+        Build clusters for each pair (mu, ratio_threshold) on one MST.
+
+        Args:
+            date (str): format as in DATE_FORMAT.
+            mu_list (list): values of mu.
+            ratio_list (list): values of ratio_threshold.
+
+        Returns
+        -------
+            n_clusters (numpy.ndarray): (len(mu_list), len(ratio_list)) array,
+            # of clusters for each pair.
+            labels (numpy.ndarray): (len(mu_list), len(ratio_list), n_vert)
+            array, id of cluster (numbered as in get_labels) for each row of
+            loader.extract_data(date).
+
         """
         data = self.loader.extract_data(date)
+        clustered = self.get_clustered(data[self.loader.ID_COLUMN].values)
+        data = data[clustered]
         n_vert = data.shape[0]
-        data_norm = normalize_data(data.loc[:, self.loader.COLUMN_LIST])
-        edge_list = get_edge_list(data_norm)
+        edge_list_tree = self.get_tree(data.loc[:, self.loader.COLUMN_LIST],
+                                       data[self.loader.ID_COLUMN].values)
+        inspector = Inspector(edge_list_tree, n_vert)
+        keep = inspector.sweep_local(mu_list, ratio_list)
+        values = data[self.loader.MAIN_COLUMN].values
+        labels = np.full(keep.shape[:2] + (clustered.shape[0],), -1,
+                         dtype=np.int32)
+        for i, j in np.ndindex(*keep.shape[:2]):
+            components = dsj_set.DisjointSetsArray(n_vert)
+            components.union_many(inspector.edge_list[keep[i, j]])
+            labels[i, j, clustered] = rank_labels(components.labels(), values)
+        n_clusters = labels.max(axis=2, initial=-1) + 1
+        return n_clusters, labels
+
+    def compare_knn(self, date, k_list, sample_size=2000, seed=0):
+        """
+        Count edges of kNN tree that differ from exact tree on a sample.
+
+        Exact tree is built by Prim's algorithm, so sample_size should be
+        small enough for O(sample_size^2) time.
+
+        Args:
+            date (str): format as in DATE_FORMAT.
+            k_list (list): values of k for MST_knn.
+            sample_size (int, optional): # of data points in random sample.
+                Defaults to 2000.
+            seed (int, optional): seed of random sample. Defaults to 0.
 
-        edge_list_tree = MST(edge_list, n_vert)
-        inspector = Inspector(edge_list_tree)
-        # mu=10, ratio=5 for US, mu=5, ratio=2.5 for countries
-        edge_list_trunc = inspector.delete_edges_local(mu=10,
-                                                       ratio_threshold=5)
-        clusters = self.build_clusters_from_edge_list(edge_list_trunc, n_vert)
-        clusters = sort_clusters(clusters, data,
-                                 col_name=self.loader.MAIN_COLUMN)
-        clusters = [set(data.iloc[i][self.loader.ID_COLUMN] for i in cluster)
-                    for cluster in clusters]
-        return clusters
+        Returns
+        -------
+            n_diff (numpy.ndarray): # of edges of kNN tree that are not in
+            exact tree for each k.
+            excess (numpy.ndarray): relative excess of total weight of kNN
+            tree over exact tree for each k.
 
-    def save_clusters(self, date: str, file_name: str, n_clusters=5):
         """
-        Build and save clusters for given date to csv file.
+        data = self.loader.extract_data(date)
+        features = normalize_data(
+            data.loc[:, self.loader.COLUMN_LIST]).values.astype(np.float64)
+        if sample_size < features.shape[0]:
+            sample = np.random.default_rng(seed).choice(
+                features.shape[0], sample_size, replace=False)
+            features = features[np.sort(sample)]
+        edge_list_exact = MST_prim(features)
+        weight_exact = max(edge_list_exact['weight'].sum(),
+                           np.finfo(np.float64).tiny)
+        n_diff = np.empty(len(k_list), dtype=np.int64)
+        excess = np.empty(len(k_list))
+        for i, k in enumerate(k_list):
+            edge_list_tree = MST_knn(features, k)
+            n_diff[i] = count_tree_diff(edge_list_tree, edge_list_exact)
+            excess[i] = edge_list_tree['weight'].sum() / weight_exact - 1
+        return n_diff, excess
+
+    def get_labels_range(self, dates, n_clusters=None, workers=1):
+        """
+        Divide admin units in clusters for each of given dates.
+
+        Dates are spread across a pool of processes, builder (and loaded
+        data) is passed to each process once, when process starts. Dates
+        found in cache are not passed to the pool. In incremental mode each
+        process keeps and updates its own previous tree, so clusters built
+        by a pool could differ from clusters built one date after another.
+
+        Args:
+        ----
+            dates (list): contains dates, format as in DATE_FORMAT.
+            n_clusters (int, optional): # of clusters to build, deduced
+                automatically if None. Defaults to None.
+            workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+        Return
+        ------
+            list: contains result of get_labels for each date.
+
+        """
+        if workers <= 1:
+            return [self.get_labels(date, n_clusters) for date in dates]
+        use_cache = self.cache is not None and not self.incremental
+        results = [None]*len(dates)
+        if use_cache:
+            results = [self.cache.get(self.get_cache_key(date, n_clusters))
+                       for date in dates]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with Pool(workers, initializer=init_worker,
+                      initargs=(self,)) as pool:
+                built = pool.map(partial(get_labels_in_worker,
+                                         n_clusters=n_clusters),
+                                 [dates[i] for i in missing])
+            for i, (result, records) in zip(missing, built):
+                results[i] = result
+                self.profiler.add_records(records)
+                if use_cache:
+                    self.cache.put(self.get_cache_key(dates[i], n_clusters),
+                                   *result)
+        return results
+
+    def get_clusters_range(self, dates, n_clusters=None, workers=1):
+        """
+        Divide admin units in clusters for each of given dates.
+
+        Args:
+        ----
+            dates (list): contains dates, format as in DATE_FORMAT.
+            n_clusters (int, optional): # of clusters to build, deduced
+                automatically if None. Defaults to None.
+            workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+        Return
+        ------
+            list: contains result of get_clusters for each date.
+
+        """
+        return [labels_to_clusters(ids, labels) for ids, labels in
+                self.get_labels_range(dates, n_clusters, workers)]
+
+    def save_clusters(self, date: str, file_name: str, n_clusters=None):
+        """
+        Build and save clusters for given date to results store or csv file.
 
         Args:
             date (str): date for which clusters will be built.
-            file_name (str): file to which results will be appended.
-            n_clusters (int, optional): # of clusters to built. Defaults to 5.
+            file_name (ResultsStore or str): store or csv file to which
+                results will be appended.
+            n_clusters (int, optional): # of clusters to built, deduced
+                automatically if None. Defaults to None.
 
         Returns
         -------
             None.
 
         """
-        clusters = self.get_clusters(date)
-        id_list = []
-        clust_list = []
-        for i in range(len(clusters)):
-            for id_ in clusters[i]:
-                id_list.append(id_)
-                clust_list.append(i+1)
-        dict_ = {'id': id_list,
-                 'Cluster id': clust_list,
-                 'Date': [date]*len(id_list)}
-        df = pd.DataFrame.from_dict(dict_)
-        df.to_csv(file_name, mode='a', header=None)
+        ids, labels = self.get_labels(date, n_clusters)
+        write_labels(ids, labels, date, file_name)
+        if isinstance(file_name, ResultsStore):
+            file_name.flush()
 
+    def save_clusters_range(self, dates, file_name: str, n_clusters=None,
+                            workers=1):
+        """
+        Build and save clusters for each of given dates.
 
-def get_edge_list(data):
+        Args:
+            dates (list): dates for which clusters will be built.
+            file_name (ResultsStore or str): store or csv file to which
+                results will be appended.
+            n_clusters (int, optional): # of clusters to built, deduced
+                automatically if None. Defaults to None.
+            workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+        Returns
+        -------
+            None.
+
+        """
+        labels_range = self.get_labels_range(dates, n_clusters, workers)
+        for date, (ids, labels) in zip(dates, labels_range):
+            write_labels(ids, labels, date, file_name)
+        if isinstance(file_name, ResultsStore):
+            file_name.flush()
+
+
+def write_labels(ids, labels, date, file_name):
     """
-    Get list of weighted edges for a full graph built on given data.
+    Append clusters built for given date to results store or csv file.
+
+    Records are only buffered by the store, store.flush() writes them.
 
     Args:
-        data (pandas.DataFrame): contains features of each data point.
+        ids (numpy.ndarray): ids of admin units.
+        labels (numpy.ndarray): id of cluster for each admin unit, -1 (0
+            in csv file) for units that are not divided in clusters.
+        date (str): date for which clusters have been built.
+        file_name (ResultsStore or str): store or csv file to which results
+            will be appended.
 
     Returns
     -------
-        edge_list (list): contains tuples, each stores 2 indexes and weight
-        of corresponding edge.
+        None.
 
     """
-    n_vert = data.shape[0]
-    all_pairs = np.array([(i, j) for i in range(n_vert)
-                          for j in range(i+1, n_vert)])
-    pool = Pool(4)
-    edge_list = pool.map(partial(build_edge, data=data), all_pairs)
-    pool.close()
-    pool.join()
-    return edge_list
+    if isinstance(file_name, ResultsStore):
+        file_name.append(date, ids, labels)
+        return
+    order = np.argsort(labels, kind='stable')
+    dict_ = {'id': ids[order],
+             'Cluster id': labels[order]+1,
+             'Date': [date]*order.shape[0]}
+    df = pd.DataFrame.from_dict(dict_)
+    df.to_csv(file_name, mode='a', header=None)
+
+
+def init_worker(builder):
+    """
+    Store builder in a worker process of pool.
+
+    Args:
+        builder (ClustersBuilder): is used by worker to build clusters.
 
+    Returns
+    -------
+        None.
 
-def normalize_data(data):
     """
-    Perform standard normalization.
+    global worker_builder
+    worker_builder = builder
+
+
+def get_labels_in_worker(date, n_clusters):
+    """
+    Build clusters for given date in a worker process of pool.
 
     Args:
-        data (pandas.DataFrame): contains stats on a particular date.
+        date (str): format as in DATE_FORMAT.
+        n_clusters (int): # of clusters to build.
 
     Returns
     -------
-        pandas.DataFrame: data after normalization.
+        tuple: result of ClustersBuilder.build_labels.
+        list: records collected by profiler of builder.
 
     """
-    return (data-data.mean())/(data.std())
+    result = worker_builder.build_labels(date, n_clusters)
+    return result, worker_builder.profiler.pop_records()
 
 
-def sort_clusters(clusters, data, col_name='New cases'):
+def rank_labels(labels, values):
     """
-    Sort clusters on avg number of new cases, ascending order.
+    Renumber clusters by average value, ascending order.
+
+    Clusters with equal averages keep their order.
 
     Args:
-        clusters (list): contains sets, each set stores ids of admin units that
-        form a cluster.
-        data (pandas.DataFrame): contains normalized indicators for all admin
-        units.
-        col_name (str): name of column, to take data for calculating rank.
-        Defaults to 'New cases' (for countries sort).
+        labels (numpy.ndarray): id of cluster for each data point.
+        values (numpy.ndarray): value of indicator for each data point.
 
     Returns
     -------
-        list: contains sets(clusters), sorted.
+        numpy.ndarray: new id of cluster for each data point.
 
     """
-    return sorted(clusters, key=lambda cluster: get_rank(cluster,
-                                                         data, col_name))
+    sizes = np.bincount(labels)
+    means = np.bincount(labels, weights=values) / np.maximum(sizes, 1)
+    rank = np.empty(sizes.shape[0], dtype=np.int32)
+    rank[np.argsort(means, kind='stable')] = np.arange(sizes.shape[0])
+    return rank[labels]
 
 
-def get_rank(cluster, data, col_name):
+def labels_to_clusters(ids, labels):
     """
-    Calculate a measure on which clusters could be sorted.
+    Group ids of admin units in sets by cluster id.
 
     Args:
-        cluster (set): stores ids of admin units that form a cluster.
-        data (pandas.DataFrame): contains normalized indicators for all admin
-        units.
-        col_name (str): name of column, to take data for calculating rank.
+        ids (numpy.ndarray): ids of admin units.
+        labels (numpy.ndarray): id of cluster for each admin unit, units
+            labeled -1 are left out.
 
     Returns
     -------
-        float: average value of indicator giben by col_name (after
-        it was normalized)
-        for units from the given cluster.
+        list: contains sets with ids, set number i stores cluster i.
 
     """
-    return data.iloc[list(cluster)][col_name].mean()
+    clustered = labels >= 0
+    ids, labels = ids[clustered], labels[clustered]
+    if labels.shape[0] == 0:
+        return []
+    order = np.argsort(labels, kind='stable')
+    groups = np.split(ids[order], np.cumsum(np.bincount(labels))[:-1])
+    return [set(group.tolist()) for group in groups]
+
+
+def get_adjacency_hash(unit_ids, adjacency):
+    """
+    Get hash that identifies adjacency of admin units.
+
+    Args:
+        unit_ids (numpy.ndarray): ids of admin units.
+        adjacency (scipy.sparse.spmatrix): matrix of adjacency of units.
+
+    Returns
+    -------
+        str: sha1 hex digest of ids and CSR structure of adjacency.
+
+    """
+    adjacency = sparse.csr_matrix(adjacency)
+    adjacency.sort_indices()
+    digest = hashlib.sha1()
+    for array in [np.asarray(unit_ids).astype(str),
+                  adjacency.indptr.astype(np.int64),
+                  adjacency.indices.astype(np.int64)]:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def get_edge_list(data, dtype=np.float64):
+    """
+    Get list of weighted edges for a full graph built on given data.
+
+    Args:
+        data (pandas.DataFrame): contains features of each data point.
+        dtype (numpy.dtype, optional): float type of weights, np.float32 or
+            np.float64. Defaults to np.float64.
+
+    Returns
+    -------
+        edge_list (numpy.ndarray): edge array (see clust.edges), each edge
+        stores 2 indexes and weight.
+
+    """
+    weights = pairwise_distances(data.values, dtype=dtype)
+    from_vert, to_vert = edge_indices(data.shape[0])
+    return make_edges(from_vert, to_vert, weights)
+
+
+def normalize_data(data, scale=None):
+    """
+    Perform standard normalization.
+
+    Columns with zero std are set to 0, so that they do not turn distances
+    between data points into NaN.
+
+    Args:
+        data (pandas.DataFrame): contains stats on a particular date.
+        scale (tuple, optional): mean and std of columns, as returned by
+            get_scale. Defaults to None (computed on data).
+
+    Returns
+    -------
+        pandas.DataFrame: data after normalization.
+
+    """
+    mean, std = get_scale(data) if scale is None else scale
+    return (data-mean)/std
+
+
+def get_scale(data):
+    """
+    Get mean and std of columns for standard normalization.
+
+    Args:
+        data (pandas.DataFrame): contains stats on a particular date.
+
+    Returns
+    -------
+        tuple: mean and std (pandas.Series), zero std is replaced by 1.
+
+    """
+    std = data.std()
+    return data.mean(), std.where(std > 0, 1)
+
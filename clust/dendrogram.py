@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Class that builds single-linkage merge tree from Minimum Spanning Tree.
+
+Created on Sat Oct 17 15:48:22 2026
+
+@author: Anna Kravets
+"""
+from clust.edges import as_edges, sort_edges
+import dsj_set
+import numpy as np
+
+
+class Dendrogram:
+    """Stores single-linkage merge tree built on edges of MST.
+
+    Data points are also put in such an order that every cluster (for any
+    # of clusters or any distance cut) is a contiguous block of points, so
+    that clusters could be found by looking at gaps between neighbouring
+    points only.
+
+    Attributes
+    ----------
+        n_vert (int): # of data points.
+        linkage (numpy.ndarray): (n_merges, 4) linkage matrix in the format
+        of scipy.cluster.hierarchy: ids of merged clusters, distance, size of
+        new cluster. Cluster formed on merge k has id n_vert+k.
+        order (numpy.ndarray): order of data points.
+        gap_merge (numpy.ndarray): index of merge that joins order[i] and
+        order[i+1], n_vert-1 if they are in different trees of forest.
+        gap_height (numpy.ndarray): distance of merge that joins order[i] and
+        order[i+1], inf if they are in different trees of forest.
+    """
+
+    def __init__(self, edge_list_tree, n_vert):
+        """
+        Build merge tree, merging clusters on edges in ascending order.
+
+        Args:
+            edge_list_tree (numpy.ndarray): edge array of MST (or of spanning
+                forest).
+            n_vert (int): # of data points.
+
+        Returns
+        -------
+            None.
+
+        """
+        edges = sort_edges(as_edges(edge_list_tree))
+        self.n_vert = n_vert
+        n_merges = len(edges)
+        self.linkage = np.zeros((n_merges, 4))
+        components = dsj_set.DisjointSetsArray(n_vert)
+        cluster_id = list(range(n_vert))
+        size = [1]*n_vert
+        head = list(range(n_vert))
+        tail = list(range(n_vert))
+        next_vert = [-1]*n_vert
+        gap = [n_vert-1]*n_vert
+        for k, (from_vert, to_vert, weight) in enumerate(
+                zip(edges['from_vert'].tolist(), edges['to_vert'].tolist(),
+                    edges['weight'].tolist())):
+            root1 = components.find_set(from_vert)
+            root2 = components.find_set(to_vert)
+            components.union(root1, root2)
+            root = components.find_set(root1)
+            self.linkage[k] = [min(cluster_id[root1], cluster_id[root2]),
+                               max(cluster_id[root1], cluster_id[root2]),
+                               weight, size[root1]+size[root2]]
+            next_vert[tail[root1]] = head[root2]
+            gap[tail[root1]] = k
+            head[root], tail[root] = head[root1], tail[root2]
+            cluster_id[root] = n_vert+k
+            size[root] = size[root1]+size[root2]
+
+        order = []
+        for vert in range(n_vert):
+            if components.find_set(vert) == vert:
+                block = head[vert]
+                while block != -1:
+                    order.append(block)
+                    block = next_vert[block]
+        self.order = np.array(order, dtype=np.int64)
+        self.gap_merge = np.array(gap, dtype=np.int64)[self.order[:-1]]
+        heights = np.append(edges['weight'].astype(np.float64), np.inf)
+        self.gap_height = heights[np.minimum(self.gap_merge, n_merges)]
+
+    def labels(self, n_clusters=None, distance=None):
+        """
+        Get id of cluster for each data point.
+
+        Either n_clusters or distance should be given. Clusters are numbered
+        in order of their smallest data points.
+
+        Args:
+            n_clusters (int, optional): # of clusters, merges are undone
+                starting from the last one.
+            distance (float, optional): merges at greater distance are
+                undone.
+
+        Returns
+        -------
+            numpy.ndarray: stores id of cluster for each data point.
+
+        """
+        if n_clusters is not None:
+            boundary = self.gap_merge >= self.n_vert-n_clusters
+        else:
+            boundary = (self.gap_height > distance) | \
+                (self.gap_merge >= len(self.linkage))
+        labels = np.empty(self.n_vert, dtype=np.int64)
+        labels[self.order] = np.concatenate([[0], np.cumsum(boundary)])
+        first = np.full(labels.max(initial=-1)+1, self.n_vert)
+        np.minimum.at(first, labels, np.arange(self.n_vert))
+        rank = np.empty_like(first)
+        rank[np.argsort(first)] = np.arange(first.shape[0])
+        return rank[labels]
+
+    def get_clusters(self, n_clusters=None, distance=None):
+        """
+        Get clusters as sets of data points.
+
+        Args:
+            n_clusters (int, optional): # of clusters.
+            distance (float, optional): merges at greater distance are
+                undone.
+
+        Returns
+        -------
+            list: contains sets that have been formed, set=cluster.
+
+        """
+        labels = self.labels(n_clusters, distance)
+        order = np.argsort(labels, kind='stable')
+        groups = np.split(order, np.cumsum(np.bincount(labels))[:-1])
+        return [set(group.tolist()) for group in groups]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Contains NumPy engine for computing pairwise distances between data points.
+
+Created on Sat Oct 17 10:12:40 2026
+
+@author: Anna Kravets
+"""
+import numpy as np
+
+BLOCK_SIZE = 1 << 16
+
+
+def pairwise_distances(features, dtype=np.float64, block_size=BLOCK_SIZE):
+    """
+    Compute l2 distances between all pairs of data points.
+
+    Distances are computed block by block (a few rows of the distance matrix
+    at once), so that temporary arrays stay small enough to fit in cache.
+
+    Args:
+        features (numpy.ndarray or pandas.DataFrame): (n_vert, n_features)
+            matrix, contains features of each data point.
+        dtype (numpy.dtype, optional): float type of result, np.float32 or
+            np.float64. Defaults to np.float64.
+        block_size (int, optional): approximate # of distances computed at
+            once. Defaults to BLOCK_SIZE.
+
+    Returns
+    -------
+        numpy.ndarray: condensed distance vector of length n(n-1)/2. Distance
+        between i and j (i < j) is stored at condensed_index(n, i, j).
+
+    """
+    features = np.asarray(features, dtype=dtype)
+    n_vert = features.shape[0]
+    weights = np.empty(n_vert*(n_vert-1)//2, dtype=dtype)
+    rows_per_block = max(1, block_size // max(n_vert, 1))
+    for start in range(0, n_vert-1, rows_per_block):
+        stop = min(start+rows_per_block, n_vert-1)
+        block = np.zeros((stop-start, n_vert-start), dtype=dtype)
+        for k in range(features.shape[1]):
+            diff = features[start:stop, k, None] - features[None, start:, k]
+            block += diff*diff
+        np.sqrt(block, out=block)
+        upper = np.arange(n_vert-start) > np.arange(stop-start)[:, None]
+        weights[condensed_index(n_vert, start, start+1):
+                condensed_index(n_vert, stop, stop+1)] = block[upper]
+    return weights
+
+
+def distances_from(features, i):
+    """
+    Compute l2 distances from data point i to all data points.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        i (int): index of data point.
+
+    Returns
+    -------
+        numpy.ndarray: vector of n_vert distances.
+
+    """
+    row = np.zeros(features.shape[0], dtype=features.dtype)
+    for k in range(features.shape[1]):
+        diff = features[:, k] - features[i, k]
+        row += diff*diff
+    return np.sqrt(row, out=row)
+
+
+def condensed_index(n_vert, i, j):
+    """
+    Get position of distance between i and j (i < j) in condensed vector.
+
+    Args:
+        n_vert (int): # of data points.
+        i (int or numpy.ndarray): index of first data point.
+        j (int or numpy.ndarray): index of second data point.
+
+    Returns
+    -------
+        int or numpy.ndarray: position in condensed vector.
+
+    """
+    return n_vert*i - i*(i+1)//2 + j - i - 1
+
+
+def edge_indices(n_vert):
+    """
+    Get indexes of vertices for each position of condensed vector.
+
+    Args:
+        n_vert (int): # of data points.
+
+    Returns
+    -------
+        tuple: two numpy.ndarray, from vertices and to vertices.
+
+    """
+    return np.triu_indices(n_vert, k=1)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Contains compact representation of weighted edges in NumPy structured array.
+
+Created on Sat Oct 17 14:31:08 2026
+
+@author: Anna Kravets
+"""
+import numpy as np
+
+EDGE_DTYPE = np.dtype([('from_vert', np.int32), ('to_vert', np.int32),
+                       ('weight', np.float64)])
+
+
+def get_edge_dtype(weight_dtype=np.float64):
+    """
+    Get dtype of edge array with given float type of weights.
+
+    Args:
+        weight_dtype (numpy.dtype, optional): np.float32 or np.float64.
+            Defaults to np.float64.
+
+    Returns
+    -------
+        numpy.dtype: structured dtype with from_vert, to_vert, weight fields.
+
+    """
+    return np.dtype([('from_vert', np.int32), ('to_vert', np.int32),
+                     ('weight', weight_dtype)])
+
+
+def make_edges(from_vert, to_vert, weights):
+    """
+    Build edge array from parallel arrays.
+
+    Args:
+        from_vert (numpy.ndarray): from vertices of edges.
+        to_vert (numpy.ndarray): to vertices of edges.
+        weights (numpy.ndarray): weights of edges.
+
+    Returns
+    -------
+        numpy.ndarray: structured array of edges (16 or 12 bytes per edge).
+
+    """
+    weights = np.asarray(weights)
+    weight_dtype = weights.dtype if weights.dtype == np.float32 \
+        else np.float64
+    edges = np.empty(weights.shape[0], dtype=get_edge_dtype(weight_dtype))
+    edges['from_vert'] = from_vert
+    edges['to_vert'] = to_vert
+    edges['weight'] = weights
+    return edges
+
+
+def as_edges(edge_list):
+    """
+    Convert list of tuples (from vert, to vert, weight) to edge array.
+
+    Args:
+        edge_list (list or numpy.ndarray): edges in tuples or edge array.
+
+    Returns
+    -------
+        numpy.ndarray: edge array, edge_list itself if it is an edge array.
+
+    """
+    if isinstance(edge_list, np.ndarray) and edge_list.dtype.names:
+        return edge_list
+    edges = np.array([tuple(edge) for edge in edge_list], dtype=EDGE_DTYPE)
+    return edges.reshape(-1)
+
+
+def sort_edges(edges):
+    """
+    Sort edges by weight, ascending order (ties keep their order).
+
+    Args:
+        edges (numpy.ndarray): edge array.
+
+    Returns
+    -------
+        numpy.ndarray: sorted edge array.
+
+    """
+    return edges[np.argsort(edges['weight'], kind='stable')]
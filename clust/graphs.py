@@ -1,55 +1,371 @@
 # -*- coding: utf-8 -*-
 """
-Contains function for building Minimum Spanning Tree, for building edge.
+Contains functions for building Minimum Spanning Tree, for building edge.
 Created on Wed Aug    5 13:06:38 2020
 
 @author: Anna Kravets
 """
+from clust.distances import distances_from
+from clust.edges import as_edges, make_edges
 import dsj_set
 import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree, Delaunay
 
 
-def MST(edge_list: list, n_vert: int):
+def MST(edge_list, n_vert: int):
     """
     Build minimum spanning tree using Kruskal's algorithm.
 
+    Sorted edges are inspected in chunks: edges whose ends are already in one
+    component are dropped for a whole chunk at once, only the rest are
+    united one by one.
+
     Args:
-        edge_list (list): contains weighted edges in tuples.
+        edge_list (numpy.ndarray or list): edge array (see clust.edges) or
+            weighted edges in tuples.
         n_vert (int): # of vertices in graph.
 
     Returns
     -------
-        edge_list_tree (list of Edge): contains edges that are used to build
-        minimum spanning tree.
+        edge_list_tree (numpy.ndarray): edge array, contains edges that are
+        used to build minimum spanning tree, sorted by weight.
+
+    """
+    edges = as_edges(edge_list)
+    order = np.argsort(edges['weight'], kind='stable')
+    from_vert, to_vert = edges['from_vert'][order], edges['to_vert'][order]
+    tree_index = []
+    components = dsj_set.DisjointSetsArray(n_vert)
+    chunk = max(n_vert, 1)
+    for start in range(0, order.shape[0], chunk):
+        if len(tree_index) >= n_vert-1:
+            break
+        from_roots = components.find_many(from_vert[start:start+chunk])
+        to_roots = components.find_many(to_vert[start:start+chunk])
+        for k in np.flatnonzero(from_roots != to_roots) + start:
+            if components.union(from_vert[k], to_vert[k]):
+                tree_index.append(k)
+    return edges[order[np.array(tree_index, dtype=np.int64)]]
+
+
+def MST_prim(features, dtype=np.float64):
+    """
+    Build minimum spanning tree of a full graph using Prim's algorithm.
+
+    Weights of edges are l2 distances between data points, they are computed
+    row by row, so that only O(n_vert) memory is used. Edges of equal weight
+    are compared by their ends (from vert, then to vert), as in MST on
+    edges of get_edge_list, so that both backends build the same tree.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        dtype (numpy.dtype, optional): float type of weights. Defaults to
+            np.float64.
+
+    Returns
+    -------
+        edge_list_tree (numpy.ndarray): edge array, contains edges of minimum
+        spanning tree, sorted by weight.
+
+    """
+    features = np.asarray(features, dtype=dtype)
+    n_vert = features.shape[0]
+    in_tree = np.zeros(n_vert, dtype=bool)
+    dist = np.full(n_vert, np.inf, dtype=dtype)
+    nearest = np.zeros(n_vert, dtype=np.int64)
+    pair = np.full(n_vert, np.iinfo(np.int64).max)
+    index = np.arange(n_vert, dtype=np.int64)
+    from_vert = np.empty(max(n_vert-1, 0), dtype=np.int64)
+    to_vert = np.empty(max(n_vert-1, 0), dtype=np.int64)
+    weights = np.empty(max(n_vert-1, 0), dtype=dtype)
+    vert = 0
+    for k in range(n_vert-1):
+        in_tree[vert] = True
+        dist[vert] = np.inf
+        new_dist = distances_from(features, vert)
+        new_pair = np.minimum(index, vert)*n_vert + np.maximum(index, vert)
+        closer = ((new_dist < dist) |
+                  ((new_dist == dist) & (new_pair < pair))) & ~in_tree
+        dist[closer] = new_dist[closer]
+        pair[closer] = new_pair[closer]
+        nearest[closer] = vert
+        nearest_dist = dist == dist.min()
+        vert = int(np.argmin(np.where(nearest_dist, pair,
+                                      np.iinfo(np.int64).max)))
+        from_vert[k] = min(nearest[vert], vert)
+        to_vert[k] = max(nearest[vert], vert)
+        weights[k] = dist[vert]
+    order = np.lexsort((to_vert, from_vert, weights))
+    return make_edges(from_vert[order], to_vert[order], weights[order])
+
+
+def MST_delaunay(features):
+    """
+    Build Euclidean minimum spanning tree using Delaunay triangulation.
+
+    Euclidean MST is a subgraph of Delaunay triangulation, so Kruskal's
+    algorithm is run only on edges of triangulation (O(n_vert) edges for 2-3
+    features) instead of a full graph. Duplicated data points are joined with
+    zero-weight edges before triangulation. Result could differ from MST of a
+    full graph only on ties.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+
+    Returns
+    -------
+        edge_list_tree (numpy.ndarray): edge array, contains edges of minimum
+        spanning tree, sorted by weight.
+
+    """
+    features = np.asarray(features, dtype=np.float64)
+    n_vert = features.shape[0]
+    if n_vert < 2:
+        return make_edges([], [], np.empty(0))
+    _, first, inverse = np.unique(features, axis=0, return_index=True,
+                                  return_inverse=True)
+    inverse = inverse.ravel()
+    dupl = np.flatnonzero(first[inverse] != np.arange(n_vert))
+
+    n_unique, n_features = first.shape[0], features.shape[1]
+    if n_unique > n_features+1:
+        simplices = Delaunay(features[first], qhull_options='QJ').simplices
+        pairs = np.concatenate([simplices[:, [a, b]]
+                                for a in range(simplices.shape[1])
+                                for b in range(a+1, simplices.shape[1])])
+    else:
+        pairs = np.column_stack(np.triu_indices(n_unique, k=1))
+    pairs = np.sort(first[pairs], axis=1)
+    keys = np.unique(pairs[:, 0].astype(np.int64)*n_vert + pairs[:, 1])
+    from_pair, to_pair = keys // n_vert, keys % n_vert
+    weights = np.linalg.norm(features[from_pair] - features[to_pair], axis=1)
+    edges = np.concatenate([
+        make_edges(first[inverse[dupl]], dupl, np.zeros(dupl.shape[0])),
+        make_edges(from_pair, to_pair, weights)])
+    return MST(edges, n_vert)
+
+
+def MST_knn(features, k=10):
+    """
+    Build approximate minimum spanning tree on k-nearest-neighbour graph.
+
+    Each data point is joined with its k nearest neighbours found in KD-tree,
+    Kruskal's algorithm is run on O(n_vert*k) edges of that graph. Components
+    of kNN graph are then joined by bridging edges (see get_bridging_edges),
+    so that result is always a spanning tree. Duplicated data points are
+    joined with zero-weight edges before kNN query, as in MST_delaunay, so
+    that groups of equal points do not become separate components of kNN
+    graph. Edges of exact tree that are not in kNN graph are replaced by
+    longer ones, see count_tree_diff.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        k (int, optional): # of nearest neighbours of each data point.
+            Defaults to 10.
+
+    Returns
+    -------
+        edge_list_tree (numpy.ndarray): edge array, contains edges of
+        spanning tree, sorted by weight.
 
     """
-    edge_list = sorted(edge_list, key=lambda edge: edge[2])
-    edge_list_tree = []
-    edge_index = 0
-    components = dsj_set.DisjointSets(n_vert)
-    while len(edge_list_tree) < n_vert-1:
-        edge = edge_list[edge_index]
-        from_vert, to_vert = edge[0], edge[1]
-        if components.find_set(from_vert) != components.find_set(to_vert):
-            components.union(from_vert, to_vert)
-            edge_list_tree.append(edge)
-        edge_index += 1
-    return edge_list_tree
+    features = np.asarray(features, dtype=np.float64)
+    n_vert = features.shape[0]
+    if n_vert < 2:
+        return make_edges([], [], np.empty(0))
+    _, first, inverse = np.unique(features, axis=0, return_index=True,
+                                  return_inverse=True)
+    inverse = inverse.ravel()
+    dupl = np.flatnonzero(first[inverse] != np.arange(n_vert))
+    edge_list = [make_edges(first[inverse[dupl]], dupl,
+                            np.zeros(dupl.shape[0]))]
 
+    unique, n_unique = features[first], first.shape[0]
+    if n_unique > 1:
+        n_near = min(k+1, n_unique)
+        dist, near = cKDTree(unique).query(unique, k=n_near)
+        from_vert = np.repeat(np.arange(n_unique), n_near)
+        near, dist = near.ravel(), dist.ravel()
+        other = near != from_vert
+        pairs = np.sort(np.column_stack([from_vert[other], near[other]]),
+                        axis=1)
+        keys, first_pair = np.unique(
+            pairs[:, 0].astype(np.int64)*n_unique + pairs[:, 1],
+            return_index=True)
+        edge_list_forest = MST(make_edges(keys // n_unique, keys % n_unique,
+                                          dist[other][first_pair]), n_unique)
+        if edge_list_forest.shape[0] < n_unique-1:
+            components = dsj_set.DisjointSetsArray(n_unique)
+            components.union_many(edge_list_forest)
+            bridges = get_bridging_edges(unique, components.labels())
+            edge_list_forest = np.concatenate([edge_list_forest, bridges])
+        from_vert = first[edge_list_forest['from_vert']]
+        to_vert = first[edge_list_forest['to_vert']]
+        edge_list.append(make_edges(np.minimum(from_vert, to_vert),
+                                    np.maximum(from_vert, to_vert),
+                                    edge_list_forest['weight']))
+    return MST(np.concatenate(edge_list), n_vert)
 
-def build_edge(pair, data):
+
+def count_tree_diff(edge_list_tree, edge_list_exact):
+    """
+    Count edges of tree that are not in exact minimum spanning tree.
+
+    Args:
+        edge_list_tree (numpy.ndarray): edge array, e.g. built by MST_knn.
+        edge_list_exact (numpy.ndarray): edge array of exact tree on the same
+            vertices.
+
+    Returns
+    -------
+        int: # of edges of edge_list_tree that are missing in
+        edge_list_exact (edges are compared by their ends).
+
+    """
+    def keys(edges):
+        from_vert = np.minimum(edges['from_vert'], edges['to_vert'])
+        to_vert = np.maximum(edges['from_vert'], edges['to_vert'])
+        return from_vert.astype(np.int64) << 32 | to_vert
+
+    return int(np.sum(~np.isin(keys(as_edges(edge_list_tree)),
+                               keys(as_edges(edge_list_exact)))))
+
+
+def MST_adjacency(features, adjacency):
     """
-    Build edge as a triple (pair[0], pair[1], weight of edge).
+    Build minimum spanning forest of graph with given adjacency.
+
+    Only pairs of adjacent data points (e.g. admin units that share
+    boundary) are joined by edges, so there are O(n_vert) edges for planar
+    maps. Each connected component of adjacency gets its own tree.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        adjacency (scipy.sparse.spmatrix): (n_vert, n_vert) matrix, nonzero
+            for adjacent data points.
+
+    Returns
+    -------
+        edge_list_tree (numpy.ndarray): edge array, contains edges of
+        minimum spanning forest, sorted by weight.
+
+    """
+    features = np.asarray(features, dtype=np.float64)
+    adjacency = sparse.coo_matrix(adjacency)
+    pairs = adjacency.row != adjacency.col
+    from_vert = np.minimum(adjacency.row, adjacency.col)[pairs]
+    to_vert = np.maximum(adjacency.row, adjacency.col)[pairs]
+    weights = np.linalg.norm(features[from_vert] - features[to_vert], axis=1)
+    return MST(make_edges(from_vert, to_vert, weights), features.shape[0])
+
+
+def update_MST(features, edge_list_forest, changed):
+    """
+    Build minimum spanning tree of a full graph from a part of previous tree.
+
+    Edges of previous tree that join unchanged data points are still in
+    minimum spanning tree of unchanged data points, so only bridging edges
+    between its components are looked up. Edges of new tree are then taken
+    from that tree and from edges at changed data points.
+
+    Args:
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        edge_list_forest (numpy.ndarray): edge array, edges of previous tree
+            that join unchanged data points.
+        changed (numpy.ndarray): boolean array, True for data points that
+            have been changed or added.
+
+    Returns
+    -------
+        edge_list_tree (numpy.ndarray): edge array, contains edges of minimum
+        spanning tree, sorted by weight.
+
+    """
+    features = np.asarray(features, dtype=np.float64)
+    n_vert = features.shape[0]
+    unchanged = np.flatnonzero(~changed)
+    edge_list = [as_edges(edge_list_forest)]
+    if unchanged.shape[0] > 1:
+        components = dsj_set.DisjointSetsArray(n_vert)
+        components.union_many(edge_list[0])
+        labels = components.labels()[unchanged]
+        bridges = get_bridging_edges(features[unchanged], labels)
+        edge_list.append(make_edges(unchanged[bridges['from_vert']],
+                                    unchanged[bridges['to_vert']],
+                                    bridges['weight']))
+    for vert in np.flatnonzero(changed):
+        weights = distances_from(features, vert)
+        to_vert = np.flatnonzero(~changed | (np.arange(n_vert) > vert))
+        to_vert = to_vert[to_vert != vert]
+        edge_list.append(make_edges(np.minimum(vert, to_vert),
+                                    np.maximum(vert, to_vert),
+                                    weights[to_vert]))
+    return MST(np.concatenate(edge_list), n_vert)
+
+
+def get_bridging_edges(features, labels, max_query=64):
+    """
+    Find edges that join components into a minimum spanning tree.
+
+    Implement Boruvka's algorithm on components: on each step every
+    component except the largest one is joined by its shortest edge to
+    another component. Nearest data point from other component is looked up
+    in KD-tree of all data points (small components) or of data points out of
+    component (large components). Data points are grouped by component once
+    on each step.
 
     Args:
-      data (pandas.DataFrame): contains features of each data point.
-      pair (tuple): contains 2 indexes of data points.
+        features (numpy.ndarray): (n_vert, n_features) matrix, contains
+            features of each data point.
+        labels (numpy.ndarray): id of component for each data point.
+        max_query (int, optional): components with more data points are
+            looked up in KD-tree of data points out of component. Defaults to
+            64.
 
     Returns
     -------
-      tuple: (pair[0], pair[1], distance measured in l2 metrics).
+        numpy.ndarray: edge array, contains bridging edges.
 
     """
-    i, j = pair[0], pair[1]
-    diff = (data.iloc[i]-data.iloc[j]).values
-    return (i, j, np.linalg.norm(diff))
+    labels = np.unique(labels, return_inverse=True)[1].ravel()
+    components = dsj_set.DisjointSetsArray(labels.max()+1)
+    tree = cKDTree(features)
+    edge_list = []
+    while True:
+        comp = components.find_many(labels)
+        order = np.argsort(comp, kind='stable')
+        comp_ids, starts, sizes = np.unique(comp[order], return_index=True,
+                                            return_counts=True)
+        if comp_ids.shape[0] <= 1:
+            return make_edges(*zip(*edge_list)) if edge_list else \
+                make_edges([], [], np.empty(0))
+        largest = np.argmax(sizes)
+        new_edges = []
+        for i, (comp_id, start, size) in enumerate(zip(comp_ids, starts,
+                                                      sizes)):
+            if i == largest:
+                continue
+            inside = order[start:start+size]
+            if size < max_query:
+                dist, near = tree.query(features[inside], k=size+1)
+                dist = np.where(comp[near] != comp_id, dist, np.inf)
+                best = np.unravel_index(np.argmin(dist), dist.shape)
+                from_vert, to_vert = inside[best[0]], near[best]
+            else:
+                outside = np.concatenate([order[:start],
+                                          order[start+size:]])
+                dist, near = cKDTree(features[outside]).query(features[inside])
+                best = np.argmin(dist)
+                from_vert, to_vert = inside[best], outside[near[best]]
+            diff = features[from_vert] - features[to_vert]
+            new_edges.append((min(from_vert, to_vert), max(from_vert, to_vert),
+                              np.sqrt(np.sum(diff*diff))))
+        for edge in sorted(new_edges, key=lambda edge: edge[2]):
+            if components.union(labels[edge[0]], labels[edge[1]]):
+                edge_list.append(edge)
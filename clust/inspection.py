@@ -6,6 +6,7 @@ Created on Sat Sep  5 12:17:47 2020
 
 @author: Anna Kravets
 """
+from clust.edges import as_edges
 import numpy as np
 
 
@@ -14,13 +15,30 @@ class Inspector:
 
     Attributes
     ----------
-        edge_list (list): contains edges from MST(minimum spanning tree)
-        of graph. Edges are sorted in ascending order based on weights.
+        edge_list (numpy.ndarray): edge array (see clust.edges), contains
+        edges from MST(minimum spanning tree) of graph. Edges are sorted in
+        ascending order based on weights.
+        n_vert (int): # of vertices.
     """
 
-    def __init__(self, edge_list):
-        self.edge_list = edge_list
-        self.n_vert = len(edge_list)+1
+    def __init__(self, edge_list, n_vert=None):
+        """
+        Store edges of tree.
+
+        Args:
+            edge_list (numpy.ndarray or list): edge array or weighted edges
+                in tuples of MST (or of spanning forest).
+            n_vert (int, optional): # of vertices, should be given for
+                spanning forest. Defaults to None (# of edges + 1, as in a
+                tree).
+
+        Returns
+        -------
+            None.
+
+        """
+        self.edge_list = as_edges(edge_list)
+        self.n_vert = len(self.edge_list)+1 if n_vert is None else n_vert
 
     def delete_edges(self, n_delete=None):
         """
@@ -35,25 +53,146 @@ class Inspector:
 
         Returns
         -------
-            list: edges that remain after deletion of inconsistent ones.
+            numpy.ndarray: edge array, edges that remain after deletion of
+            inconsistent ones (a view of edge_list).
 
         """
-        if n_delete == 0:
-            return self.edge_list
         if n_delete is None:
-            weights = np.array([edge[2] for edge in self.edge_list])
+            weights = self.edge_list['weight']
             mean_weight = np.mean(weights)
             std_weight = np.std(weights)
             n_delete = np.sum(weights > mean_weight + std_weight)
-        return self.edge_list[:-n_delete]
+        return self.edge_list[:len(self.edge_list)-n_delete]
 
     def delete_edges_local(self, mu=10, ratio_threshold=5):
-        self.edge_dict = self.get_dict()
-        new_edge_list = []
-        for edge in self.edge_list:
-            if is_consistent(self.edge_dict, edge, mu, ratio_threshold):
-                new_edge_list.append(edge)
-        return new_edge_list
+        """
+        Delete edges that are inconsistent (locally).
+
+        Edge is inconsistent if on any of its sides its weight is greater
+        than avg+mu*std and than ratio_threshold*avg, where avg and std are
+        computed on weights of edges that are at most 2 steps away from this
+        side of the edge. Rule is the same as in is_consistent, but it is
+        checked for all edges at once.
+
+        Args:
+            mu (float, optional): # of stds. Defaults to 10.
+            ratio_threshold (float, optional): ratio of weight to avg.
+                Defaults to 5.
+
+        Returns
+        -------
+            numpy.ndarray: edge array, edges that remain after deletion of
+            inconsistent ones.
+
+        """
+        return self.edge_list[self.get_consistent_mask(mu, ratio_threshold)]
+
+    def get_consistent_mask(self, mu, ratio_threshold):
+        """
+        Check which edges are consistent (locally).
+
+        Args:
+            mu (float): # of stds.
+            ratio_threshold (float): ratio of weight to avg.
+
+        Returns
+        -------
+            numpy.ndarray: boolean array, True for consistent edges.
+
+        """
+        return self.sweep_local([mu], [ratio_threshold])[0, 0]
+
+    def sweep_local(self, mu_list, ratio_list, rtol=1e-9):
+        """
+        Check which edges are consistent for each pair (mu, ratio_threshold).
+
+        Local stats are computed once, thresholds for all pairs are checked
+        by broadcasting. Edges for which weight is within rtol of one of
+        thresholds are rechecked with is_consistent, so that rounding errors
+        of vectorized sums do not change result. Zero weights next to zero
+        thresholds (e.g. edges among equal data points) are compared exactly
+        and are not rechecked.
+
+        Args:
+            mu_list (list): values of mu.
+            ratio_list (list): values of ratio_threshold.
+            rtol (float, optional): relative tolerance for rechecking.
+                Defaults to 1e-9.
+
+        Returns
+        -------
+            numpy.ndarray: (len(mu_list), len(ratio_list), n_edges) boolean
+            array, True for consistent edges.
+
+        """
+        mu_list = np.asarray(mu_list, dtype=np.float64)[:, None, None]
+        ratio_list = np.asarray(ratio_list, dtype=np.float64)[:, None, None]
+        weights = self.edge_list['weight'].astype(np.float64)
+        avg, std, has_neighbours = self.get_local_stats()
+        ratio = np.divide(weights, avg, out=np.ones_like(avg),
+                          where=avg > 0)
+        threshold = avg+mu_list*std
+        above_std = has_neighbours & (weights > threshold)
+        above_ratio = ratio > ratio_list
+        keep = ~(above_std[:, None] & above_ratio[None]).any(axis=2)
+
+        near_std = np.abs(weights-threshold) <= rtol*np.abs(threshold)
+        near_ratio = np.abs(ratio-ratio_list) <= rtol*np.abs(ratio_list)
+        exact = (weights == 0) & (threshold == 0)
+        near = has_neighbours & ~exact[:, None] & \
+            (near_std[:, None] | near_ratio[None])
+        to_recheck = np.argwhere(near.any(axis=2))
+        if to_recheck.shape[0] > 0:
+            edge_dict = self.get_dict()
+            for i, j, k in to_recheck:
+                keep[i, j, k] = is_consistent(
+                    edge_dict, self.edge_list[k], mu_list[i, 0, 0],
+                    ratio_list[j, 0, 0])
+        return keep
+
+    def get_local_stats(self):
+        """
+        Compute avg and std of weights near each side of each edge.
+
+        For side vert of edge (vert, another_vert) weights of edges
+        (vert, neighbour) and (neighbour, next) are taken, where neighbour !=
+        another_vert and next != vert. Sum of these weights is a sum of
+        weights of all edges at neighbours, so it is gathered from per-vertex
+        sums on CSR adjacency of tree.
+
+        Returns
+        -------
+            avg (numpy.ndarray): (2, n_edges) array, avg weight near from
+            vert (row 0) and near to vert (row 1) of each edge.
+            std (numpy.ndarray): (2, n_edges) array, std of weights.
+            has_neighbours (numpy.ndarray): (2, n_edges) boolean array, False
+            if there are no edges near the side.
+
+        """
+        ends = np.stack([self.edge_list['from_vert'],
+                         self.edge_list['to_vert']]).astype(np.int64)
+        weights = self.edge_list['weight'].astype(np.float64)
+        indptr, indices, adj_weights = get_csr(ends[0], ends[1], weights,
+                                               self.n_vert)
+        rows = np.repeat(np.arange(self.n_vert), np.diff(indptr))
+
+        degree = np.diff(indptr).astype(np.float64)
+        total = np.bincount(rows, weights=adj_weights,
+                            minlength=self.n_vert)
+        total_sq = np.bincount(rows, weights=adj_weights**2,
+                               minlength=self.n_vert)
+        near_stats = []
+        for stat in [degree, total, total_sq]:
+            near = np.bincount(rows, weights=stat[indices],
+                               minlength=self.n_vert)
+            near_stats.append(near[ends] - stat[ends[::-1]])
+        count, total, total_sq = near_stats
+
+        has_neighbours = count > 0
+        count = np.where(has_neighbours, count, 1)
+        avg = total/count
+        std = np.sqrt(np.maximum(total_sq/count - avg**2, 0))
+        return avg, std, has_neighbours
 
     def get_dict(self):
         edge_dict = [[] for i in range(self.n_vert)]
@@ -63,6 +202,32 @@ class Inspector:
         return edge_dict
 
 
+def get_csr(from_vert, to_vert, weights, n_vert):
+    """
+    Build CSR adjacency of undirected graph.
+
+    Args:
+        from_vert (numpy.ndarray): from vertices of edges.
+        to_vert (numpy.ndarray): to vertices of edges.
+        weights (numpy.ndarray): weights of edges.
+        n_vert (int): # of vertices in graph.
+
+    Returns
+    -------
+        indptr (numpy.ndarray): neighbours of vert are
+        indices[indptr[vert]:indptr[vert+1]].
+        indices (numpy.ndarray): neighbours of all vertices.
+        adj_weights (numpy.ndarray): weights of edges to neighbours.
+
+    """
+    src = np.concatenate([from_vert, to_vert])
+    dst = np.concatenate([to_vert, from_vert])
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n_vert+1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_vert), out=indptr[1:])
+    return indptr, dst[order], np.concatenate([weights, weights])[order]
+
+
 def is_consistent(edge_dict, edge_to_check, mu, ratio_threshold):
     from_vert, to_vert = edge_to_check[0], edge_to_check[1]
     weight_to_check = edge_to_check[2]
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Classes that measure time and memory of stages of building clusters.
+
+Created on Sat Oct 17 22:30:15 2026
+
+@author: Anna Kravets
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import logging
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class Profiler:
+    """Collects records about stages and counts, passes them to callbacks.
+
+    Stage record stores wall and CPU time of stage, peak memory allocated by
+    Python during stage (if memory is True) and max resident set size of
+    process. Count record stores a value, e.g. # of edges. Records get
+    context (e.g. date) that is set by set_context.
+
+    Callbacks are not passed to processes of pool: records collected in
+    a process are returned to main process by pop_records and passed to
+    callbacks there by add_records.
+
+    Attributes
+    ----------
+        enabled (bool): True, records are collected.
+        memory (bool): whether peak memory is traced by tracemalloc.
+        records (list): contains dict for each record.
+        callbacks (list): functions that are called with each new record.
+        context (dict): is added to each record.
+        peaks (list): peak memory so far for each stage that is running,
+        stages could be nested.
+    """
+
+    enabled = True
+
+    def __init__(self, memory=False, callbacks=()):
+        """
+        Create profiler without records.
+
+        Args:
+            memory (bool, optional): whether to trace peak memory by
+                tracemalloc (slows down allocations). Defaults to False.
+            callbacks (iterable, optional): functions that are called with
+                each new record. Defaults to ().
+
+        Returns
+        -------
+            None.
+
+        """
+        self.memory = memory
+        self.records = []
+        self.callbacks = list(callbacks)
+        self.context = dict()
+        self.peaks = []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['callbacks'] = []
+        state['records'] = []
+        return state
+
+    def add_callback(self, callback):
+        """
+        Register function that is called with each new record.
+
+        Args:
+            callback (callable): takes record (dict).
+
+        Returns
+        -------
+            None.
+
+        """
+        self.callbacks.append(callback)
+
+    def set_context(self, **context):
+        """
+        Set values that are added to each following record.
+
+        Args:
+            **context: e.g. date=date.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.context = context
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure stage of computation in with block.
+
+        If block raises an exception, stage is not recorded, but memory of
+        stages around it is still measured.
+
+        Args:
+            name (str): name of stage.
+
+        Yields
+        ------
+            None.
+
+        """
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1],
+                                     tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            self.peaks.append(start_memory)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = dict(self.context, stage=name,
+                          wall=time.perf_counter() - start_wall,
+                          cpu=time.process_time() - start_cpu)
+            if self.memory:
+                peak = max(self.peaks.pop(),
+                           tracemalloc.get_traced_memory()[1])
+                record['peak_bytes'] = peak - start_memory
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+        if resource is not None:
+            record['max_rss_kb'] = \
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.add_records([record])
+
+    def count(self, name, value):
+        """
+        Record a count, e.g. # of edges.
+
+        Args:
+            name (str): name of count.
+            value (int): value of count.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.add_records([dict(self.context, count=name, value=int(value))])
+
+    def add_records(self, records):
+        """
+        Store records and pass them to callbacks.
+
+        Args:
+            records (list): contains dict for each record.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.records += records
+        for record in records:
+            for callback in self.callbacks:
+                callback(record)
+
+    def pop_records(self):
+        """
+        Get records collected so far and forget them.
+
+        Returns
+        -------
+            list: contains dict for each record.
+
+        """
+        records, self.records = self.records, []
+        return records
+
+    def get_stats(self, key='date'):
+        """
+        Group records by value of context key.
+
+        Args:
+            key (str, optional): key of context. Defaults to 'date'.
+
+        Returns
+        -------
+            dict: maps value of key to dict, that maps name of stage to its
+            total wall time, CPU time and max of peak memory, and name of
+            count to its value.
+
+        """
+        stats = dict()
+        for record in self.records:
+            group = stats.setdefault(record.get(key), dict())
+            if 'stage' in record:
+                stage = group.setdefault(record['stage'],
+                                         {'wall': 0., 'cpu': 0.})
+                stage['wall'] += record['wall']
+                stage['cpu'] += record['cpu']
+                if 'peak_bytes' in record:
+                    stage['peak_bytes'] = max(stage.get('peak_bytes', 0),
+                                              record['peak_bytes'])
+            else:
+                group[record['count']] = record['value']
+        return stats
+
+    def dump(self, file_name):
+        """
+        Write records to file, one json object per line.
+
+        Args:
+            file_name (str): path of file.
+
+        Returns
+        -------
+            None.
+
+        """
+        with open(file_name, 'w') as output:
+            for record in self.records:
+                output.write(json.dumps(record) + '\n')
+
+
+class NullProfiler:
+    """Profiler that collects nothing, is used when profiling is off."""
+
+    enabled = False
+    records = ()
+
+    def stage(self, name):
+        """Return context manager that does nothing."""
+        return NULL_STAGE
+
+    def count(self, name, value):
+        """Do nothing."""
+
+    def set_context(self, **context):
+        """Do nothing."""
+
+    def add_records(self, records):
+        """Do nothing."""
+
+    def pop_records(self):
+        """Return empty list."""
+        return []
+
+
+NULL_STAGE = nullcontext()
+NULL_PROFILER = NullProfiler()
+
+
+def get_log_sink(logger=None, level=logging.INFO):
+    """
+    Get callback that writes records to log as json.
+
+    Args:
+        logger (logging.Logger, optional): Defaults to None (logger of this
+            module).
+        level (int, optional): level of messages. Defaults to logging.INFO.
+
+    Returns
+    -------
+        callable: takes record (dict).
+
+    """
+    logger = logger or logging.getLogger(__name__)
+    return lambda record: logger.log(level, json.dumps(record))
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Class that stores clusters built on many dates in a compact binary file.
+
+Created on Sat Oct 17 17:05:43 2026
+
+@author: Anna Kravets
+"""
+import json
+import numpy as np
+import os
+import pandas as pd
+
+RECORD_DTYPE = np.dtype([('date', np.uint16), ('unit', np.int32),
+                         ('cluster', np.int16)])
+RECORD_DTYPE_V1 = np.dtype([('date', np.uint16), ('unit', np.int32),
+                            ('cluster', np.int8)])
+VERSION = 2
+
+
+class ResultsStore:
+    """Stores id of cluster of each admin unit for each date.
+
+    Records (date index, unit index, cluster id) are appended to a binary
+    file in blocks, records of one date are always contiguous. Index file
+    (file_name + '.json') stores ids of units, dates and offset of records of
+    each date, so that clusters on one date are read with a single seek.
+    If clusters on a date are saved again, new records are appended and
+    offset of the date is moved to them. Stores written before version 2
+    (int8 cluster ids, no version in index) are still read and appended to
+    in their format.
+
+    Attributes
+    ----------
+        file_name (str): path of binary file with records.
+        unit_ids (list): ids of admin units, record stores index in this list.
+        dates (list): dates, record stores index in this list.
+        offsets (dict): maps date to (# of first record, # of records).
+        buffer (list): record arrays that have not been written yet.
+        record_dtype (numpy.dtype): dtype of records in binary file.
+    """
+
+    def __init__(self, file_name):
+        """
+        Open store, load index if store exists.
+
+        Args:
+            file_name (str): path of binary file with records.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.file_name = file_name
+        self.unit_ids, self.dates, self.offsets = [], [], dict()
+        self.buffer = []
+        self.record_dtype = RECORD_DTYPE
+        try:
+            with open(self.get_index_path()) as index_file:
+                index = json.load(index_file)
+        except OSError:
+            index = None
+        if index is not None:
+            self.unit_ids, self.dates = index['unit_ids'], index['dates']
+            self.offsets = {date: tuple(offset) for date, offset in
+                            zip(self.dates, index['offsets'])}
+            if index.get('version', 1) == 1:
+                self.record_dtype = RECORD_DTYPE_V1
+        self.unit_index = {id_: i for i, id_ in enumerate(self.unit_ids)}
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+        self.n_records = 0
+        if os.path.exists(file_name):
+            self.n_records = \
+                os.path.getsize(file_name) // self.record_dtype.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def get_index_path(self):
+        """
+        Get path of index file.
+
+        Returns
+        -------
+            str: path of index file.
+
+        """
+        return self.file_name + '.json'
+
+    def append(self, date, ids, labels):
+        """
+        Add clusters built on given date to buffer.
+
+        Args:
+            date (str): date for which clusters have been built.
+            ids (numpy.ndarray): ids of admin units.
+            labels (numpy.ndarray): id of cluster for each admin unit.
+
+        Returns
+        -------
+            None.
+
+        """
+        labels = np.asarray(labels)
+        max_label = np.iinfo(self.record_dtype['cluster']).max
+        if labels.shape[0] and \
+                not -1 <= labels.min() <= labels.max() <= max_label:
+            raise ValueError(
+                'cluster ids on {} should be in -1..{}, got {}..{}'.format(
+                    date, max_label, labels.min(), labels.max()))
+        if date not in self.date_index:
+            self.date_index[date] = len(self.dates)
+            self.dates.append(date)
+        if len(self.dates) > np.iinfo(np.uint16).max:
+            raise ValueError('too many dates in one store')
+        units = np.empty(labels.shape[0], dtype=np.int32)
+        for i, id_ in enumerate(np.asarray(ids).tolist()):
+            if id_ not in self.unit_index:
+                self.unit_index[id_] = len(self.unit_ids)
+                self.unit_ids.append(id_)
+            units[i] = self.unit_index[id_]
+        records = np.empty(labels.shape[0], dtype=self.record_dtype)
+        records['date'] = self.date_index[date]
+        records['unit'] = units
+        records['cluster'] = labels
+        self.offsets[date] = (self.n_records, records.shape[0])
+        self.n_records += records.shape[0]
+        self.buffer.append(records)
+
+    def flush(self):
+        """
+        Write buffered records to binary file and update index file.
+
+        Returns
+        -------
+            None.
+
+        """
+        if not self.buffer:
+            return
+        folder = os.path.dirname(self.file_name)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.file_name, 'ab') as records_file:
+            np.concatenate(self.buffer).tofile(records_file)
+        self.buffer = []
+        index = {'unit_ids': self.unit_ids, 'dates': self.dates,
+                 'offsets': [self.offsets[date] for date in self.dates]}
+        if self.record_dtype == RECORD_DTYPE:
+            index['version'] = VERSION
+        path = self.get_index_path()
+        with open(path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(path + '.tmp', path)
+
+    def read(self, date):
+        """
+        Read clusters built on given date.
+
+        Args:
+            date (str): date for which clusters have been built.
+
+        Returns
+        -------
+            ids (numpy.ndarray): ids of admin units.
+            labels (numpy.ndarray): id of cluster for each admin unit, empty
+            arrays if there are no clusters for the date.
+
+        """
+        if date not in self.offsets:
+            return np.array([]), np.array([], dtype=np.int16)
+        self.flush()
+        start, count = self.offsets[date]
+        with open(self.file_name, 'rb') as records_file:
+            records_file.seek(start * self.record_dtype.itemsize)
+            records = np.fromfile(records_file, dtype=self.record_dtype,
+                                  count=count)
+        ids = np.array(self.unit_ids)[records['unit']]
+        return ids, records['cluster']
+
+    def get_dates(self):
+        """
+        Get dates for which clusters are stored.
+
+        Returns
+        -------
+            list: dates in order in which they were first saved.
+
+        """
+        return list(self.offsets)
+
+    @classmethod
+    def from_csv(cls, csv_file, file_name):
+        """
+        Convert csv file written by ClustersBuilder.save_clusters to store.
+
+        save_clusters writes no header, older results have a header line,
+        it is skipped if first line has no numeric index.
+
+        Args:
+            csv_file (str): path of csv file with columns index, id, cluster
+                id (starting from 1), date.
+            file_name (str): path of binary file of new store.
+
+        Returns
+        -------
+            ResultsStore: new store.
+
+        """
+        with open(csv_file) as lines:
+            first = lines.readline().split(',', 1)[0].strip('"\' ')
+        df = pd.read_csv(csv_file, header=None,
+                         skiprows=0 if first.isdigit() else 1,
+                         names=['index', 'id', 'Cluster id', 'Date'])
+        store = cls(file_name)
+        for date, rows in df.groupby('Date', sort=False):
+            store.append(date, rows['id'].values, rows['Cluster id'].values-1)
+        store.flush()
+        return store
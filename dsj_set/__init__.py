@@ -5,3 +5,4 @@ Created on Thu Sep 10 13:57:20 2020
 @author: Anna Kravets
 """
 from dsj_set.disjoint_set_optimized import DisjointSets
+from dsj_set.disjoint_set_array import DisjointSetsArray
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Class that implements disjoint sets data structure on top of NumPy arrays.
+
+Created on Sat Oct 17 11:02:15 2026
+
+@author: Anna Kravets
+"""
+import numpy as np
+
+
+class DisjointSetsArray:
+    """Mimics division of integers 0..n-1 into sets that do not intersect.
+
+    Same as DisjointSets, but parents and ranks are stored in int32 arrays,
+    FIND SET is iterative (no recursion limit on long chains) and bulk
+    operations over all elements are vectorized.
+
+    Attributes
+    ----------
+    parents: numpy.ndarray
+        stores index of parent for each element
+    ranks: numpy.ndarray
+        stores ranks of elements - upper bound on number of children of the
+        element.
+
+    """
+
+    def __init__(self, n):
+        """
+        Create n sets, each set containing one integer i where i in [0..n-1].
+
+        Args:
+            n (int): number of elements.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.parents = np.arange(n, dtype=np.int32)
+        self.ranks = np.zeros(n, dtype=np.int32)
+
+    def union(self, id1, id2):
+        """
+        Merge sets containing id1 and id2, if they are distinct. Update ranks.
+
+        Args:
+            id1 (int): one of ints.
+            id2 (int): one of ints.
+
+        Returns
+        -------
+            bool: True if sets have been merged, False if id1 and id2 already
+            were in the same set.
+
+        """
+        parent1 = self.find_set(id1)
+        parent2 = self.find_set(id2)
+        if parent1 == parent2:
+            return False
+        rank1, rank2 = self.ranks[parent1], self.ranks[parent2]
+        if rank2 >= rank1:
+            self.parents[parent1] = parent2
+            if rank1 == rank2:
+                self.ranks[parent2] += 1
+        else:
+            self.parents[parent2] = parent1
+        return True
+
+    def find_set(self, i):
+        """
+        Find representative id of the set to which the element i belongs.
+
+        Implement iterative path compression.
+
+        Args:
+            i (int): element for which the set is being looked up.
+
+        Returns
+        -------
+            int: representative id of the set containing ith element.
+
+        """
+        parents = self.parents
+        root = i
+        while parents[root] != root:
+            root = parents[root]
+        while parents[i] != root:
+            parents[i], i = root, parents[i]
+        return int(root)
+
+    def find_many(self, ids):
+        """
+        Find representative ids for an array of elements.
+
+        Args:
+            ids (numpy.ndarray): elements for which sets are being looked up.
+
+        Returns
+        -------
+            numpy.ndarray: representative ids of sets containing elements.
+
+        """
+        self.compress()
+        return self.parents[ids]
+
+    def compress(self):
+        """
+        Point every element directly to the representative of its set.
+
+        Returns
+        -------
+            None.
+
+        """
+        parents = self.parents
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+        self.parents = parents
+
+    def union_many(self, edges):
+        """
+        Merge sets for each pair of elements in edges.
+
+        Roots are linked to the smallest root they are joined with, all
+        pairs are processed at once in a few vectorized rounds.
+
+        Args:
+            edges (numpy.ndarray): (n_edges, 2) array, each row stores a pair
+                of elements, or structured array with from_vert and to_vert
+                fields.
+
+        Returns
+        -------
+            None.
+
+        """
+        if isinstance(edges, np.ndarray) and edges.dtype.names:
+            from_ids = edges['from_vert'].astype(np.int64)
+            to_ids = edges['to_vert'].astype(np.int64)
+        else:
+            edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+            from_ids, to_ids = edges[:, 0], edges[:, 1]
+        while from_ids.shape[0] > 0:
+            from_roots = self.find_many(from_ids)
+            to_roots = self.find_many(to_ids)
+            distinct = from_roots != to_roots
+            from_ids, to_ids = from_ids[distinct], to_ids[distinct]
+            from_roots, to_roots = from_roots[distinct], to_roots[distinct]
+            np.minimum.at(self.parents, np.maximum(from_roots, to_roots),
+                          np.minimum(from_roots, to_roots))
+
+    def labels(self):
+        """
+        Get id of set for each element.
+
+        Sets are numbered 0..n_sets-1 in order of their smallest elements.
+
+        Returns
+        -------
+            numpy.ndarray: stores id of set for each element.
+
+        """
+        self.compress()
+        _, first, inverse = np.unique(self.parents, return_index=True,
+                                      return_inverse=True)
+        rank = np.empty(first.shape[0], dtype=np.int32)
+        rank[np.argsort(first)] = np.arange(first.shape[0], dtype=np.int32)
+        return rank[inverse.ravel()]
+
+    def sizes(self):
+        """
+        Get size of each set, sets are numbered as in labels().
+
+        Returns
+        -------
+            numpy.ndarray: stores # of elements in each set.
+
+        """
+        return np.bincount(self.labels())
+
+    def groups(self):
+        """
+        Get elements of each set, sets are numbered as in labels().
+
+        Returns
+        -------
+            list: contains numpy.ndarray with elements of each set.
+
+        """
+        labels = self.labels()
+        if labels.shape[0] == 0:
+            return []
+        order = np.argsort(labels, kind='stable')
+        return np.split(order, np.cumsum(np.bincount(labels))[:-1])
+
+    def get_all_sets(self):
+        """
+        Generate list of sets of elements.
+
+        Returns
+        -------
+            all_sets (list): contains sets that have been formed.
+
+        """
+        return [set(group.tolist()) for group in self.groups()]
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+Contains functions that save boundaries of admin units in a compact cache.
+
+Coordinates are quantized on an integer grid (as in TopoJSON), arcs shared
+by neighbouring units are simplified once, so that simplification opens no
+gaps between them, and rings are stored delta-encoded in a compressed .npz
+file. Adjacency of admin units (units that share a segment of boundary on
+the grid, touching at a single point is not enough) is found before
+simplification and stored in the same file as a CSR graph keyed by id of
+unit.
+
+Created on Sat Oct 17 19:26:51 2026
+
+@author: Anna Kravets
+"""
+import numpy as np
+import os
+from scipy import sparse
+
+CACHE_FOLDER = 'data/cache/geometry'
+CACHE_VERSION = 4
+QUANTIZATION = 100000
+
+
+def get_cache_path(name):
+    """
+    Get path of geometry cache.
+
+    Args:
+        name (str): name of cache, e.g. name of MapBuilder class.
+
+    Returns
+    -------
+        str: path of .npz file.
+
+    """
+    return os.path.join(CACHE_FOLDER, name + '.npz')
+
+
+def save_geometry(geo_json, id_key, name_key, path, source,
+                  quantization=QUANTIZATION, min_area=8):
+    """
+    Quantize and simplify boundaries, save them with ids, names and adjacency.
+
+    Args:
+        geo_json (dict): GeoJson FeatureCollection with Polygon and
+            MultiPolygon features.
+        id_key (str): property with id of admin unit.
+        name_key (str): property with name of admin unit.
+        path (str): path of .npz file.
+        source (str): identifies source of geo_json, is checked on loading.
+        quantization (int, optional): # of grid steps along each axis.
+            Defaults to QUANTIZATION.
+        min_area (float, optional): points that form a triangle of smaller
+            area (in squared grid steps) with their neighbours are dropped,
+            see simplify_rings. Defaults to 8 (well below a pixel of
+            rendered images), 0.5 drops only points on a straight line.
+
+    Returns
+    -------
+        None.
+
+    """
+    features = geo_json['features']
+    polygons = [get_polygons(feature['geometry']) for feature in features]
+    rings = [np.asarray(ring, dtype=np.float64)[:, :2]
+             for feature in polygons for polygon in feature
+             for ring in polygon]
+    points = np.concatenate(rings) if rings else np.zeros((1, 2))
+    translate = points.min(axis=0)
+    extent = points.max(axis=0) - translate
+    scale = np.where(extent > 0, extent, 1) / (quantization-1)
+
+    grids = [np.round((ring - translate) / scale).astype(np.int32)
+             for ring in rings]
+    point_keys = [grid[:, 0].astype(np.int64)*quantization + grid[:, 1]
+                  for grid in grids]
+    ring_features = [k for k, feature in enumerate(polygons)
+                     for polygon in feature for ring in polygon]
+    simplified = iter(simplify_rings(grids, min_area))
+
+    ring_list, ring_sizes, polygon_sizes, feature_sizes = [], [], [], []
+    for feature in polygons:
+        n_polygons = 0
+        for polygon in feature:
+            grids = [next(simplified) for ring in polygon]
+            if not grids or grids[0].shape[0] < 4:
+                continue
+            grids = [grid for grid in grids if grid.shape[0] >= 4]
+            ring_list += [np.diff(grid, axis=0, prepend=[[0, 0]])
+                          for grid in grids]
+            ring_sizes += [grid.shape[0] for grid in grids]
+            polygon_sizes.append(len(grids))
+            n_polygons += 1
+        feature_sizes.append(n_polygons)
+
+    ids = np.array([feature['properties'][id_key] for feature in features])
+    has_rings = np.zeros(len(features), dtype=bool)
+    has_rings[ring_features] = True
+    unit_ids, unit_index = np.unique(ids[has_rings], return_inverse=True)
+    feature_units = np.full(len(features), -1, dtype=np.int64)
+    feature_units[has_rings] = unit_index.ravel()
+    segments = [np.sort(np.column_stack([keys, np.roll(keys, -1)]), axis=1)
+                for keys in point_keys]
+    indptr, indices = get_adjacency(
+        np.concatenate(segments) if segments else np.zeros((0, 2), np.int64),
+        np.repeat(feature_units[ring_features],
+                  [len(keys) for keys in point_keys]).astype(np.int64),
+        unit_ids.shape[0])
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path + '.tmp', 'wb') as cache_file:
+        np.savez_compressed(
+            cache_file,
+            points=np.concatenate(ring_list) if ring_list else
+            np.zeros((0, 2), dtype=np.int32),
+            ring_sizes=np.array(ring_sizes, dtype=np.int32),
+            polygon_sizes=np.array(polygon_sizes, dtype=np.int32),
+            feature_sizes=np.array(feature_sizes, dtype=np.int32),
+            ids=ids,
+            names=np.array([feature['properties'][name_key]
+                            for feature in features]),
+            unit_ids=unit_ids, adjacency_indptr=indptr,
+            adjacency_indices=indices, translate=translate, scale=scale,
+            source=np.array(source), version=np.array(CACHE_VERSION))
+    os.replace(path + '.tmp', path)
+
+
+def load_geometry(path, id_key, name_key, source):
+    """
+    Load boundaries from cache as GeoJson FeatureCollection.
+
+    Args:
+        path (str): path of .npz file.
+        id_key (str): property in which id of admin unit is stored.
+        name_key (str): property in which name of admin unit is stored.
+        source (str): identifies source of geo_json, should be the same as
+            on saving.
+
+    Returns
+    -------
+        dict: GeoJson data (features have only id_key and name_key
+        properties), None if there is no valid cache for source.
+
+    """
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            arrays = dict(arrays)
+    except (OSError, ValueError):
+        return None
+    if arrays['version'] != CACHE_VERSION or arrays['source'] != source:
+        return None
+    ring_ends = np.cumsum(arrays['ring_sizes'])
+    points = np.cumsum(arrays['points'], axis=0, dtype=np.int64)
+    ring_starts = ring_ends - arrays['ring_sizes']
+    base = np.zeros((ring_ends.shape[0], 2), dtype=np.int64)
+    base[1:] = points[ring_ends[:-1]-1]
+    points -= np.repeat(base, arrays['ring_sizes'], axis=0)
+    scale, translate = arrays['scale'], arrays['translate']
+    decimals = int(max(0, np.ceil(-np.log10(scale.min()))))
+    coords = np.round(points*scale + translate, decimals).tolist()
+
+    rings = [coords[start:end] for start, end in zip(ring_starts.tolist(),
+                                                     ring_ends.tolist())]
+    polygons = split_sizes(rings, arrays['polygon_sizes'])
+    features = []
+    for id_, name, feature in zip(
+            arrays['ids'].tolist(), arrays['names'].tolist(),
+            split_sizes(polygons, arrays['feature_sizes'])):
+        features.append({
+            'type': 'Feature',
+            'properties': {id_key: id_, name_key: name},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': feature}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def load_adjacency(path, source):
+    """
+    Load adjacency of admin units from cache.
+
+    Args:
+        path (str): path of .npz file.
+        source (str): identifies source of geo_json, should be the same as
+            on saving.
+
+    Returns
+    -------
+        unit_ids (numpy.ndarray): sorted unique ids of admin units that
+        have geometry.
+        adjacency (scipy.sparse.csr_matrix): (n_units, n_units) symmetric
+        matrix, row i has ones in columns of units adjacent to unit_ids[i].
+        None if there is no valid cache for source.
+
+    """
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            arrays = dict(arrays)
+    except (OSError, ValueError):
+        return None
+    if arrays['version'] != CACHE_VERSION or arrays['source'] != source:
+        return None
+    unit_ids, indices = arrays['unit_ids'], arrays['adjacency_indices']
+    adjacency = sparse.csr_matrix(
+        (np.ones(indices.shape[0], dtype=np.int8), indices,
+         arrays['adjacency_indptr']),
+        shape=(unit_ids.shape[0], unit_ids.shape[0]))
+    return unit_ids, adjacency
+
+
+def get_adjacency(segments, segment_units, n_units):
+    """
+    Find pairs of admin units that share a segment of boundary.
+
+    Units that touch only at a point (e.g. at corners of a grid) are not
+    adjacent.
+
+    Args:
+        segments (numpy.ndarray): (n_segments, 2) array, keys of ends of
+            each segment of boundaries (equal for equal points), smaller key
+            first.
+        segment_units (numpy.ndarray): index of unit to which each segment
+            belongs.
+        n_units (int): # of units.
+
+    Returns
+    -------
+        indptr (numpy.ndarray): units adjacent to unit i are
+        indices[indptr[i]:indptr[i+1]].
+        indices (numpy.ndarray): adjacent units of all units, sorted for
+        each unit.
+
+    """
+    proper = segments[:, 0] != segments[:, 1]
+    records = np.unique(np.column_stack([segments[proper],
+                                         segment_units[proper]]), axis=0)
+    ends, units = records[:, :2], records[:, 2]
+    from_list, to_list = [], []
+    shift = 1
+    while shift < ends.shape[0]:
+        same = np.all(ends[shift:] == ends[:-shift], axis=1)
+        if not same.any():
+            break
+        from_list.append(units[:-shift][same])
+        to_list.append(units[shift:][same])
+        shift += 1
+    from_unit = np.concatenate(from_list + to_list + [[]]).astype(np.int64)
+    to_unit = np.concatenate(to_list + from_list + [[]]).astype(np.int64)
+    edges = np.unique(from_unit*n_units + to_unit)
+    indptr = np.zeros(n_units+1, dtype=np.int64)
+    np.cumsum(np.bincount(edges // n_units, minlength=n_units),
+              out=indptr[1:])
+    return indptr, (edges % n_units).astype(np.int32)
+
+
+def get_polygons(geometry):
+    """
+    Get list of polygons of Polygon or MultiPolygon geometry.
+
+    Args:
+        geometry (dict): GeoJson geometry.
+
+    Returns
+    -------
+        list: polygons, each polygon is a list of rings.
+
+    """
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def simplify_rings(rings, min_area):
+    """
+    Simplify rings so that boundaries shared by neighbours stay shared.
+
+    As in TopoJSON, rings are cut in arcs at junctions (points where rings
+    that pass through the point have different neighbouring points), each
+    distinct arc is simplified once (see simplify_arc) and the same result is
+    used in every ring that contains the arc, so that no gaps or slivers
+    appear between neighbouring units. Rings without junctions are one arc
+    that starts at their smallest point.
+
+    Args:
+        rings (list): (n_points, 2) integer coordinates of each ring, first
+            point equals last one.
+        min_area (float): threshold on area of triangle.
+
+    Returns
+    -------
+        list: coordinates of each simplified ring, first point equals last
+        one.
+
+    """
+    cycles = []
+    for ring in rings:
+        keep = np.ones(ring.shape[0], dtype=bool)
+        keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+        cycles.append(ring[keep][:-1].astype(np.int64))
+    junctions = get_junctions(cycles)
+    arcs = dict()
+    result = []
+    for cycle, is_junction in zip(cycles, junctions):
+        if cycle.shape[0] < 3:
+            result.append(np.concatenate([cycle, cycle[:1]]).astype(np.int32))
+            continue
+        starts = np.flatnonzero(is_junction)
+        if starts.shape[0] == 0:
+            starts = np.lexsort((cycle[:, 1], cycle[:, 0]))[:1]
+        cycle = np.roll(cycle, -starts[0], axis=0)
+        ends = np.append(starts - starts[0], cycle.shape[0])
+        cycle = np.concatenate([cycle, cycle[:1]])
+        parts = [get_shared_arc(cycle[start:end+1], min_area, arcs)[:-1]
+                 for start, end in zip(ends[:-1], ends[1:])]
+        result.append(np.concatenate(parts + [cycle[:1]]).astype(np.int32))
+    return result
+
+
+def get_junctions(cycles):
+    """
+    Find points at which arcs shared by rings start and end.
+
+    Point is a junction if rings pass through it with different pairs of
+    neighbouring points.
+
+    Args:
+        cycles (list): (n_points, 2) integer coordinates of each ring, last
+            point is not repeated.
+
+    Returns
+    -------
+        list: boolean array for each ring, True for junctions.
+
+    """
+    if not cycles:
+        return []
+    keys = [cycle[:, 0] << 32 | cycle[:, 1] for cycle in cycles]
+    point = np.concatenate(keys)
+    prev = np.concatenate([np.roll(key, 1) for key in keys])
+    next_ = np.concatenate([np.roll(key, -1) for key in keys])
+    pairs = np.unique(np.column_stack([point, np.minimum(prev, next_),
+                                       np.maximum(prev, next_)]), axis=0)
+    points, n_pairs = np.unique(pairs[:, 0], return_counts=True)
+    is_junction = np.isin(point, points[n_pairs > 1])
+    return np.split(is_junction,
+                    np.cumsum([key.shape[0] for key in keys])[:-1])
+
+
+def get_shared_arc(arc, min_area, arcs):
+    """
+    Simplify arc once for all rings that contain it.
+
+    Arc is simplified in canonical direction (from smaller end to larger),
+    result is stored in arcs and reused when the same arc is found in
+    another ring in any direction.
+
+    Args:
+        arc (numpy.ndarray): (n_points, 2) integer coordinates of arc.
+        min_area (float): threshold on area of triangle.
+        arcs (dict): maps canonical arc (bytes) to simplified arc.
+
+    Returns
+    -------
+        numpy.ndarray: coordinates of simplified arc, ends are kept.
+
+    """
+    first, last = tuple(arc[0]), tuple(arc[-1])
+    reverse = last < first or (last == first and
+                               tuple(arc[-2]) < tuple(arc[1]))
+    canonical = arc[::-1] if reverse else arc
+    key = canonical.tobytes()
+    if key not in arcs:
+        arcs[key] = simplify_arc(canonical, min_area)
+    return arcs[key][::-1] if reverse else arcs[key]
+
+
+def simplify_arc(arc, min_area):
+    """
+    Drop points of arc that form small triangles with their neighbours.
+
+    Points that form a triangle of area < min_area with their neighbours are
+    dropped in rounds (areas are recomputed after each round, as in
+    Visvalingam's algorithm), two neighbouring points are never dropped in
+    one round, ends of arc are kept.
+
+    Args:
+        arc (numpy.ndarray): (n_points, 2) integer coordinates of arc.
+        min_area (float): threshold on area of triangle.
+
+    Returns
+    -------
+        numpy.ndarray: coordinates of simplified arc.
+
+    """
+    while arc.shape[0] > 2:
+        prev, point, next_ = arc[:-2], arc[1:-1], arc[2:]
+        area = np.abs((point[:, 0]-prev[:, 0]) * (next_[:, 1]-point[:, 1]) -
+                      (point[:, 1]-prev[:, 1]) * (next_[:, 0]-point[:, 0]))
+        drop = area < 2*min_area
+        drop[1:] &= ~drop[:-1]
+        if not drop.any():
+            break
+        arc = np.concatenate([arc[:1], point[~drop], arc[-1:]])
+    return arc
+
+
+def split_sizes(items, sizes):
+    """
+    Split list in consecutive parts of given sizes.
+
+    Args:
+        items (list): items to split.
+        sizes (numpy.ndarray): size of each part.
+
+    Returns
+    -------
+        list: parts of items.
+
+    """
+    ends = np.cumsum(sizes).tolist()
+    return [items[end-size:end] for end, size in zip(ends, sizes.tolist())]
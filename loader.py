@@ -8,23 +8,284 @@ Created on Sat Sep  5 09:57:37 2020
 """
 from datetime import datetime as dt
 from datetime import timedelta
+import hashlib
+import json
+import numpy as np
+import os
 import pandas as pd
 
 
 class Loader:
     """Stores data from specified files. Extracts data relevent to given date.
 
+    Data is pivoted once into a (date x unit x feature) tensor, so that
+    extracting data on a date is a slice of the tensor.
+
     Attributes
     ----------
         DATE_FORMAT (str): format in which dates sould be passed to methods.
+        features (numpy.ndarray): (n_dates, n_vert, len(COLUMN_LIST)) tensor
+        with values of COLUMN_LIST columns, NaN for missing rows.
+        present (numpy.ndarray): (n_dates, n_vert) boolean array, True if
+        there is a row for a unit on a date.
+        unit_ids (numpy.ndarray): values of ID_COLUMN for each unit, in order
+        of first appearance in INFO_FILE.
+        dates (list): stores datetime.date for each date, ascending order.
+        source_hash (str): sha1 hash of INFO_FILE.
+        CACHE_FOLDER (str): folder where tensor is cached in .npy files, so
+        that INFO_FILE is parsed only once.
 
     """
 
     DATE_FORMAT = '%d.%m.%y'
+    CACHE_FOLDER = 'data/cache'
+    CACHE_VERSION = 1
+    CACHE_ARRAYS = ['features', 'present', 'unit_ids', 'dates']
+
+    def __init__(self, **kwargs):
+        """
+        Load tensor from cache or INFO_FILE, then set up subclass.
+
+        Args:
+            **kwargs: parameters of subclass, passed to set_up.
+
+        Returns
+        -------
+            None.
+
+        """
+        if not self.load_cache():
+            self.build_tensor(pd.read_csv(self.INFO_FILE))
+            self.source_hash = get_file_hash(self.INFO_FILE)
+            self.save_cache()
+        self.set_up(**kwargs)
+
+    @classmethod
+    def from_frame(cls, data_all_days, **kwargs):
+        """
+        Create loader from data frame instead of INFO_FILE, cache is not used.
+
+        Args:
+            data_all_days (pandas.DataFrame): contains data on all dates in
+                the same format as INFO_FILE.
+            **kwargs: parameters of subclass, passed to set_up.
+
+        Returns
+        -------
+            Loader: loader that stores data_all_days.
+
+        """
+        loader = cls.__new__(cls)
+        loader.build_tensor(data_all_days)
+        loader.source_hash = hashlib.sha1(pd.util.hash_pandas_object(
+            data_all_days, index=False).values.tobytes()).hexdigest()
+        loader.set_up(**kwargs)
+        return loader
+
+    def set_up(self):
+        """
+        Set up state of subclass, when tensor has been loaded.
+
+        Is called both by __init__ and by from_frame, so subclasses put
+        their setup here rather than in __init__.
+
+        Returns
+        -------
+            None.
+
+        """
 
-    def __init__(self):
-        self.data_all_days = pd.read_csv(self.INFO_FILE)
-        self.n_vert = len(set(self.data_all_days[self.ID_COLUMN]))
+    def get_cache_path(self, name):
+        """
+        Get path of cache file for this loader.
+
+        Args:
+            name (str): name of array or 'meta'.
+
+        Returns
+        -------
+            str: path of cache file.
+
+        """
+        extension = '.json' if name == 'meta' else '.npy'
+        return os.path.join(self.CACHE_FOLDER, type(self).__name__,
+                            name + extension)
+
+    def get_source_info(self):
+        """
+        Get info that identifies current version of INFO_FILE.
+
+        Returns
+        -------
+            dict: path, size, mtime of INFO_FILE and columns that are cached.
+
+        """
+        stat = os.stat(self.INFO_FILE)
+        return {'version': self.CACHE_VERSION,
+                'path': os.path.abspath(self.INFO_FILE),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'columns': self.COLUMN_LIST + [self.ID_COLUMN]}
+
+    def load_cache(self):
+        """
+        Load tensor from cache if cache was built for current INFO_FILE.
+
+        Arrays are opened as memory maps. If only mtime of INFO_FILE has
+        changed, its hash is compared with the cached one.
+
+        Returns
+        -------
+            bool: True if cache has been loaded.
+
+        """
+        try:
+            with open(self.get_cache_path('meta')) as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return False
+        info = self.get_source_info()
+        if any(meta.get(key) != info[key] for key in info if key != 'mtime'):
+            return False
+        if meta['mtime'] != info['mtime']:
+            if get_file_hash(self.INFO_FILE) != meta['hash']:
+                return False
+            meta['mtime'] = info['mtime']
+            self.write_meta(meta)
+        try:
+            arrays = {name: np.load(self.get_cache_path(name), mmap_mode='r')
+                      for name in self.CACHE_ARRAYS}
+        except (OSError, ValueError):
+            return False
+        self.set_tensor(arrays['features'], arrays['present'],
+                        arrays['unit_ids'],
+                        list(arrays['dates'].astype(object)))
+        self.source_hash = meta['hash']
+        return True
+
+    def save_cache(self):
+        """
+        Save tensor and indexes to cache.
+
+        Files are written under temporary names and then renamed, meta file
+        is written last, so that a partly written cache is never loaded.
+
+        Returns
+        -------
+            None.
+
+        """
+        os.makedirs(os.path.dirname(self.get_cache_path('meta')),
+                    exist_ok=True)
+        arrays = {'features': self.features, 'present': self.present,
+                  'unit_ids': self.unit_ids,
+                  'dates': np.array(self.dates, dtype='datetime64[D]')}
+        for name in self.CACHE_ARRAYS:
+            path = self.get_cache_path(name)
+            with open(path + '.tmp', 'wb') as cache_file:
+                np.save(cache_file, arrays[name])
+            os.replace(path + '.tmp', path)
+        meta = self.get_source_info()
+        meta['hash'] = self.source_hash
+        self.write_meta(meta)
+
+    def write_meta(self, meta):
+        """
+        Write meta info of cache.
+
+        Args:
+            meta (dict): info returned by get_source_info and hash of
+            INFO_FILE.
+
+        Returns
+        -------
+            None.
+
+        """
+        path = self.get_cache_path('meta')
+        with open(path + '.tmp', 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(path + '.tmp', path)
+
+    def build_tensor(self, data_all_days):
+        """
+        Pivot data into tensor and set up unit and date indexes.
+
+        Args:
+            data_all_days (pandas.DataFrame): contains data on all dates.
+
+        Returns
+        -------
+            None.
+
+        """
+        unit_codes, unit_ids = pd.factorize(data_all_days[self.ID_COLUMN])
+        date_codes, date_strings = pd.factorize(data_all_days['Date'])
+        # '#' (no zero padding) is not needed for parsing and is not
+        # supported by strptime
+        date_values = pd.to_datetime(
+            pd.Series(date_strings),
+            format=self.DATE_FORMAT_INTERNAL.replace('#', '')).dt.date
+        order = np.argsort(date_values.values)
+        date_codes = np.argsort(order)[date_codes]
+
+        unit_ids = np.asarray(unit_ids)
+        if unit_ids.dtype == object:
+            unit_ids = unit_ids.astype(str)
+
+        shape = (date_strings.shape[0], unit_ids.shape[0])
+        features = np.full(shape + (len(self.COLUMN_LIST),), np.nan)
+        features[date_codes, unit_codes] = \
+            data_all_days[self.COLUMN_LIST].to_numpy(dtype=np.float64)
+        present = np.zeros(shape, dtype=bool)
+        present[date_codes, unit_codes] = True
+        self.set_tensor(features, present, unit_ids,
+                        list(date_values.values[order]))
+
+    def set_tensor(self, features, present, unit_ids, dates):
+        """
+        Set up tensor and indexes.
+
+        Args:
+            features (numpy.ndarray): (n_dates, n_vert, n_features) tensor.
+            present (numpy.ndarray): (n_dates, n_vert) boolean array.
+            unit_ids (numpy.ndarray): values of ID_COLUMN for each unit.
+            dates (list): stores datetime.date for each date.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.features = features
+        self.present = present
+        self.unit_ids = unit_ids
+        self.dates = dates
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+        self.n_vert = self.unit_ids.shape[0]
+
+    def extract_features(self, date):
+        """
+        Extract features for a particular date without building DataFrame.
+
+        Args:
+            date (str): format as in DATE_FORMAT.
+
+        Returns
+        -------
+            features (numpy.ndarray): (n_units, len(COLUMN_LIST)) matrix, is
+            a view of tensor if all units are present on given date.
+            ids (numpy.ndarray): values of ID_COLUMN for each row.
+
+        """
+        date = dt.strptime(date, self.DATE_FORMAT).date()
+        if date not in self.date_index:
+            return np.empty((0, len(self.COLUMN_LIST))), self.unit_ids[:0]
+        i = self.date_index[date]
+        if self.present[i].all():
+            return self.features[i], self.unit_ids
+        return self.features[i, self.present[i]], \
+            self.unit_ids[self.present[i]]
 
     def extract_data(self, date):
         """
@@ -38,13 +299,42 @@ class Loader:
             pandas.DataFrame: contains data on given date.
 
         """
-        date = format(dt.strptime(date, self.DATE_FORMAT).date(),
-                      self.DATE_FORMAT_INTERNAL)
-        data_on_date = \
-            self.data_all_days.loc[self.data_all_days['Date'] == date].copy()
-        column_list = self.COLUMN_LIST + [self.ID_COLUMN]
-        data_on_date = data_on_date.loc[:, column_list]
-        return data_on_date.reset_index(drop=True)
+        features, ids = self.extract_features(date)
+        data_on_date = pd.DataFrame(features, columns=self.COLUMN_LIST,
+                                    copy=True)
+        data_on_date[self.ID_COLUMN] = ids
+        return data_on_date
+
+    def get_data_key(self):
+        """
+        Get values that identify data extracted by this loader.
+
+        Returns
+        -------
+            list: name of loader class and hash of INFO_FILE.
+
+        """
+        return [type(self).__name__, self.source_hash]
+
+
+def get_file_hash(path, chunk_size=1 << 20):
+    """
+    Compute sha1 hash of file content.
+
+    Args:
+        path (str): path of file.
+        chunk_size (int, optional): # of bytes read at once. Defaults to 1 MB.
+
+    Returns
+    -------
+        str: hex digest of hash.
+
+    """
+    file_hash = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
 
 
 class LoaderCountries(Loader):
@@ -72,16 +362,15 @@ class LoaderCountries(Loader):
     COLUMN_LIST = ['New cases', 'New deaths', 'New recovered']
     MAIN_COLUMN = 'New cases'
 
-    def __init__(self):
+    def set_up(self):
         """
-        Save data about countries' indicators on all dates.
+        Load population of countries.
 
         Returns
         -------
             None.
 
         """
-        Loader.__init__(self)
         self.country_population = \
             pd.read_csv(self.POPULATION_INFO_FILE)['Population']
 
@@ -128,6 +417,10 @@ class LoaderCountries(Loader):
 class LoaderUS(Loader):
     """Stores data from specified files. Extracts data relevent to given date.
 
+    Data on a date contains # of confirmed cases and deaths over window days
+    before the date (precomputed for all dates), only counties with new cases
+    or deaths are included.
+
     Attributes
     ----------
         DATE_FORMAT_INTERNAL (str): format in which dates are stored in
@@ -138,6 +431,9 @@ class LoaderUS(Loader):
         analysis.
         MAIN_COLUMN (str): name of column. On values from this column clusters
         will be sort.
+        window (int): # of days over which new cases and deaths are counted.
+        cumulative (numpy.ndarray): tensor with cumulative # of cases and
+        deaths, as in INFO_FILE.
 
     """
 
@@ -147,23 +443,72 @@ class LoaderUS(Loader):
     COLUMN_LIST = ['Confirmed', 'Deaths']
     MAIN_COLUMN = 'Confirmed'
 
-    def extract_data(self, date):
+    def __init__(self, window=7):
         """
-        Extract data for a particular date.
+        Load data and precompute differences over window for all dates.
 
         Args:
-            date (str): format as in DATE_FORMAT.
+            window (int, optional): # of days over which new cases and
+            deaths are counted. Defaults to 7.
 
         Returns
         -------
-            pandas.DataFrame: contains data on given date.
+            None.
+
+        """
+        Loader.__init__(self, window=window)
+
+    def set_up(self, window=7):
+        """
+        Precompute differences over window for all dates.
+
+        Args:
+            window (int, optional): # of days over which new cases and
+            deaths are counted. Defaults to 7.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.window = window
+        self.cumulative = self.features
+        self.features, self.present = self.get_differences(window)
+
+    def get_differences(self, window):
+        """
+        Compute differences of indicators over window for all dates at once.
+
+        Counties that are missing on a date or window days before it, and
+        counties with no new cases and deaths are marked as not present.
+
+        Args:
+            window (int): # of days between dates that are subtracted.
+
+        Returns
+        -------
+            features (numpy.ndarray): (n_dates, n_vert, n_features) tensor of
+            differences.
+            present (numpy.ndarray): (n_dates, n_vert) boolean array.
+
+        """
+        lag = np.array([self.date_index.get(date - timedelta(days=window), -1)
+                        for date in self.dates], dtype=np.int64)
+        has_lag = lag >= 0
+        features = np.full(self.cumulative.shape, np.nan)
+        features[has_lag] = self.cumulative[has_lag] - \
+            self.cumulative[lag[has_lag]]
+        with np.errstate(invalid='ignore'):
+            present = self.present & (features.sum(axis=2) > 0)
+        return features, present
+
+    def get_data_key(self):
+        """
+        Get values that identify data extracted by this loader.
+
+        Returns
+        -------
+            list: name of loader class, hash of INFO_FILE and window.
 
         """
-        data = Loader.extract_data(self, date)
-        date_on_prev_week = format(dt.strptime(date, Loader.DATE_FORMAT) -
-                                   timedelta(days=7), Loader.DATE_FORMAT)
-        data_on_prev_week = Loader.extract_data(self, date_on_prev_week)
-        for name in self.COLUMN_LIST:
-            data[name] = data[name] - data_on_prev_week[name]
-        data = data.loc[data['Confirmed'] + data['Deaths'] > 0]
-        return data.reset_index(drop=True)
+        return Loader.get_data_key(self) + [self.window]
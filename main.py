@@ -7,20 +7,31 @@ Created on Tue Aug  4 13:46:34 2020
 @author: Anna Kravets
 """
 import clust
+import json
 import loader
+import sys
 import visualization
 import time
 
 dates = ['09.03.20']
 
 if __name__ == '__main__':
-    cluster_builder = clust.ClustersBuilder(loader.LoaderUS())
-    map_builder = visualization.MapBuilderUS()
+    # tracing memory slows building clusters down, pass --memory to trace
+    profiler = clust.Profiler(memory='--memory' in sys.argv[1:])
+    cluster_builder = clust.ClustersBuilder(loader.LoaderUS(), cache=True,
+                                            profiler=profiler)
 
+    start = time.time()
+    with clust.ResultsStore('results/us_clust.bin') as store:
+        cluster_builder.save_clusters_range(dates, store, workers=4)
+    print('time elapsed: ', time.time()-start)
+    for date, stats in profiler.get_stats().items():
+        print(date, json.dumps(stats, indent=1))
+    profiler.dump('results/us_profile.jsonl')
+    map_builder = visualization.MapBuilderUS('results/us_clust.bin')
     for date in dates:
         print(date)
-        start = time.time()
-        cluster_builder.save_clusters(date, 'us_clust.csv')
-        print('time elapsed: ', time.time()-start)
         map_builder.save_map(cluster_builder,date)
-    map_builder.save_as_img(dates)
\ No newline at end of file
+    map_builder.save_map_range(dates)
+    map_builder.save_as_img(dates, workers=4)
+    map_builder.save_animation(dates, workers=4)
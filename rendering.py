@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+Contains class that draws colored clusters on projected boundaries to images.
+
+Created on Sat Oct 17 20:41:17 2026
+
+@author: Anna Kravets
+"""
+from collections import deque
+from multiprocessing import Pool
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import struct
+import zlib
+
+TITLE_HEIGHT = 60
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class FrameRenderer:
+    """Draws admin units colored by cluster id without a browser.
+
+    Boundaries are projected (Web Mercator, as on folium maps) and scaled to
+    pixels once, then each frame only fills prepared polygons with colors.
+
+    Attributes
+    ----------
+        size (tuple): (width, height) of image in pixels.
+        rings (list): flat lists of pixel coordinates of each ring.
+        ring_feature (list): index of feature for each ring.
+        ring_is_hole (list): True for inner rings of polygons.
+        order (list): order in which rings are drawn: outer rings, holes,
+        then again polygons that lie inside holes of other features.
+        outline (str): color of boundaries.
+    """
+
+    def __init__(self, geo_json, size, bounds, outline='#606060'):
+        """
+        Project boundaries to pixels.
+
+        Args:
+            geo_json (dict): GeoJson data with Polygon and MultiPolygon
+                features.
+            size (tuple): (width, height) of image in pixels.
+            bounds (tuple): ((lat_min, lon_min), (lat_max, lon_max)), area
+                that is fitted in image below the title.
+            outline (str, optional): color of boundaries. Defaults to
+                '#606060'.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.size = size
+        self.outline = outline
+        (lat_min, lon_min), (lat_max, lon_max) = bounds
+        corner_min = project(np.array([[lon_min, lat_min]]))[0]
+        corner_max = project(np.array([[lon_max, lat_max]]))[0]
+        width, height = size[0], size[1] - TITLE_HEIGHT
+        scale = min(width / (corner_max[0]-corner_min[0]),
+                    height / (corner_max[1]-corner_min[1]))
+        extent = scale*(corner_max-corner_min)
+        offset = np.array([(width-extent[0]) / 2,
+                           TITLE_HEIGHT + (height-extent[1]) / 2])
+
+        self.rings, self.ring_feature, self.ring_is_hole = [], [], []
+        ring_polygon, n_polygons = [], 0
+        for i, feature in enumerate(geo_json['features']):
+            geometry = feature['geometry'] or {'type': None}
+            polygons = [geometry['coordinates']] \
+                if geometry['type'] == 'Polygon' else \
+                geometry['coordinates'] if geometry['type'] == 'MultiPolygon' \
+                else []
+            for polygon in polygons:
+                n_polygons += 1
+                for k, ring in enumerate(polygon):
+                    if len(ring) < 3:
+                        continue
+                    xy = project(np.asarray(ring, dtype=np.float64)[:, :2])
+                    pixels = np.empty_like(xy)
+                    pixels[:, 0] = offset[0] + scale*(xy[:, 0]-corner_min[0])
+                    pixels[:, 1] = offset[1] + scale*(corner_max[1]-xy[:, 1])
+                    self.rings.append(pixels.ravel().tolist())
+                    self.ring_feature.append(i)
+                    self.ring_is_hole.append(k > 0)
+                    ring_polygon.append(n_polygons)
+        self.order = get_draw_order(self.rings, self.ring_is_hole,
+                                    ring_polygon)
+
+    def render(self, labels, colors, title=''):
+        """
+        Draw admin units colored by cluster id.
+
+        Args:
+            labels (numpy.ndarray): cluster id of each feature of geo_json.
+            colors (list): color for each cluster id.
+            title (str, optional): text drawn above the map. Defaults to ''.
+
+        Returns
+        -------
+            PIL.Image.Image: RGB image.
+
+        """
+        image = Image.new('RGB', self.size, '#ffffff')
+        draw = ImageDraw.Draw(image)
+        fills = [colors[label] for label in np.asarray(labels).tolist()]
+        for i in self.order:
+            fill = '#ffffff' if self.ring_is_hole[i] else \
+                fills[self.ring_feature[i]]
+            draw.polygon(self.rings[i], fill=fill, outline=self.outline)
+        if title:
+            font = ImageFont.load_default(size=TITLE_HEIGHT // 2)
+            draw.text((self.size[0] / 2, TITLE_HEIGHT / 2), title,
+                      fill='#000000', font=font, anchor='mm')
+        return image
+
+
+def get_draw_order(rings, ring_is_hole, ring_polygon):
+    """
+    Get order in which rings are drawn, so that holes do not hide polygons.
+
+    Polygons whose bounding box lies inside bounding box of a hole of
+    another polygon are drawn again after all holes.
+
+    Args:
+        rings (list): flat lists of pixel coordinates of each ring.
+        ring_is_hole (list): True for inner rings of polygons.
+        ring_polygon (list): index of polygon for each ring.
+
+    Returns
+    -------
+        list: indexes of rings.
+
+    """
+    is_hole = np.array(ring_is_hole, dtype=bool)
+    polygon = np.array(ring_polygon, dtype=np.int64)
+    boxes = np.array([[min(ring[0::2]), min(ring[1::2]),
+                       max(ring[0::2]), max(ring[1::2])] for ring in rings])
+    outer, holes = np.flatnonzero(~is_hole), np.flatnonzero(is_hole)
+    order = outer.tolist() + holes.tolist()
+    if holes.shape[0] == 0:
+        return order
+    inside = np.zeros(outer.shape[0], dtype=bool)
+    for hole in holes:
+        inside |= (boxes[outer, 0] >= boxes[hole, 0]) & \
+            (boxes[outer, 1] >= boxes[hole, 1]) & \
+            (boxes[outer, 2] <= boxes[hole, 2]) & \
+            (boxes[outer, 3] <= boxes[hole, 3]) & \
+            (polygon[outer] != polygon[hole])
+    redraw = np.isin(polygon, polygon[outer[inside]])
+    return order + np.flatnonzero(redraw & ~is_hole).tolist() + \
+        np.flatnonzero(redraw & is_hole).tolist()
+
+
+def project(lon_lat):
+    """
+    Project coordinates to Web Mercator (in radians, y axis goes north).
+
+    Args:
+        lon_lat (numpy.ndarray): (n_points, 2) longitude and latitude in
+            degrees.
+
+    Returns
+    -------
+        numpy.ndarray: (n_points, 2) projected coordinates.
+
+    """
+    lat = np.radians(np.clip(lon_lat[:, 1], -85, 85))
+    return np.column_stack([np.radians(lon_lat[:, 0]),
+                            np.log(np.tan(np.pi/4 + lat/2))])
+
+
+def save_frames(renderer, frames, workers=1):
+    """
+    Render frames and save them as png images.
+
+    Renderer (with projected boundaries) is passed to each process of pool
+    once, when process starts, each task passes only labels of a frame.
+
+    Args:
+        renderer (FrameRenderer): draws frames.
+        frames (list): contains tuples (labels, colors, title, file name).
+        workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+    Returns
+    -------
+        None.
+
+    """
+    if workers <= 1:
+        init_worker(renderer)
+        for frame in frames:
+            save_frame(frame)
+        return
+    with Pool(workers, initializer=init_worker,
+              initargs=(renderer,)) as pool:
+        pool.map(save_frame, frames)
+
+
+def render_frames(renderer, frames, workers=1):
+    """
+    Render frames one by one, in order.
+
+    Frames are rendered by a pool of processes as in save_frames, but
+    images are returned to caller, so that they could be written to a
+    stream without intermediate files. At most 2 frames per process are
+    submitted ahead of caller, so rendered images do not pile up in memory
+    when caller writes them slower than pool renders them.
+
+    Args:
+        renderer (FrameRenderer): draws frames.
+        frames (iterable): contains tuples (labels, colors, title).
+        workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+    Yields
+    ------
+        numpy.ndarray: (height, width, 3) uint8 RGB image of each frame.
+
+    """
+    if workers <= 1:
+        init_worker(renderer)
+        for frame in frames:
+            yield render_frame(frame)
+        return
+    with Pool(workers, initializer=init_worker,
+              initargs=(renderer,)) as pool:
+        pending = deque()
+        for frame in frames:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(render_frame, (frame,)))
+        while pending:
+            yield pending.popleft().get()
+
+
+class APNGWriter:
+    """Writes frames to animated png file as they come.
+
+    Only previous frame is kept in memory: each frame is stored as a region
+    that differs from previous frame, identical frames are merged into one
+    frame of longer duration. # of frames is written when file is closed.
+
+    Attributes
+    ----------
+        file (file object): output file opened for binary writing.
+        size (tuple): (width, height) of frames.
+        delay (int): duration of one frame in milliseconds.
+        n_frames (int): # of frames that have been written.
+        sequence (int): sequence # of next fcTL or fdAT chunk.
+        previous (numpy.ndarray): last appended image.
+        pending (list): last frame that has not been written yet: region,
+        compressed data, # of merged frames.
+    """
+
+    def __init__(self, file_name, size, delay=200, loops=0, level=6):
+        """
+        Open file, write header.
+
+        Args:
+            file_name (str): path of .png file.
+            size (tuple): (width, height) of frames.
+            delay (int, optional): duration of one frame in milliseconds.
+                Defaults to 200.
+            loops (int, optional): # of times animation is played, 0 for
+                infinite loop. Defaults to 0.
+            level (int, optional): zlib compression level. Defaults to 6.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.file = open(file_name, 'wb')
+        self.size = size
+        self.delay = delay
+        self.loops = loops
+        self.level = level
+        self.n_frames, self.sequence = 0, 0
+        self.previous, self.pending = None, None
+        self.file.write(PNG_SIGNATURE)
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1],
+                                               8, 2, 0, 0, 0))
+        self.actl_position = self.file.tell()
+        self.write_chunk(b'acTL', struct.pack('>II', 0, loops))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_chunk(self, kind, data):
+        """
+        Write png chunk.
+
+        Args:
+            kind (bytes): type of chunk.
+            data (bytes): data of chunk.
+
+        Returns
+        -------
+            None.
+
+        """
+        self.file.write(struct.pack('>I', len(data)) + kind + data +
+                        struct.pack('>I', zlib.crc32(kind + data)))
+
+    def append(self, image):
+        """
+        Add frame to animation.
+
+        Args:
+            image (numpy.ndarray or PIL.Image.Image): RGB image of size
+                self.size.
+
+        Returns
+        -------
+            None.
+
+        """
+        image = np.asarray(image, dtype=np.uint8)
+        if self.previous is None:
+            region = (0, 0, self.size[0], self.size[1])
+        else:
+            changed = np.any(image != self.previous, axis=2)
+            if not changed.any():
+                self.pending[2] += 1
+                return
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            region = (cols[0], rows[0], cols[-1]+1, rows[-1]+1)
+        self.write_pending()
+        x0, y0, x1, y1 = region
+        self.pending = [region,
+                        compress_image(image[y0:y1, x0:x1], self.level), 1]
+        self.previous = image
+
+    def write_pending(self):
+        """
+        Write last frame that has not been written yet.
+
+        Returns
+        -------
+            None.
+
+        """
+        if self.pending is None:
+            return
+        (x0, y0, x1, y1), data, count = self.pending
+        self.write_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', self.sequence, x1-x0, y1-y0, x0, y0,
+            min(self.delay*count, 0xffff), 1000, 0, 0))
+        self.sequence += 1
+        if self.n_frames == 0:
+            self.write_chunk(b'IDAT', data)
+        else:
+            self.write_chunk(b'fdAT', struct.pack('>I', self.sequence) + data)
+            self.sequence += 1
+        self.n_frames += 1
+        self.pending = None
+
+    def close(self):
+        """
+        Write last frame, # of frames and end of file, close file.
+
+        Returns
+        -------
+            None.
+
+        """
+        if self.file.closed:
+            return
+        self.write_pending()
+        self.write_chunk(b'IEND', b'')
+        self.file.seek(self.actl_position)
+        self.write_chunk(b'acTL', struct.pack('>II', self.n_frames,
+                                               self.loops))
+        self.file.close()
+
+
+def compress_image(image, level=6):
+    """
+    Filter and compress RGB image as png image data.
+
+    Each row is stored as difference with previous row (png filter Up).
+
+    Args:
+        image (numpy.ndarray): (height, width, 3) uint8 image.
+        level (int, optional): zlib compression level. Defaults to 6.
+
+    Returns
+    -------
+        bytes: compressed data.
+
+    """
+    rows = image.reshape(image.shape[0], -1)
+    filtered = np.empty((rows.shape[0], rows.shape[1]+1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[:, 1:] = rows
+    filtered[1:, 1:] -= rows[:-1]
+    return zlib.compress(filtered.tobytes(), level)
+
+
+def init_worker(renderer):
+    """
+    Store renderer in a worker process of pool.
+
+    Args:
+        renderer (FrameRenderer): is used by worker to draw frames.
+
+    Returns
+    -------
+        None.
+
+    """
+    global worker_renderer
+    worker_renderer = renderer
+
+
+def save_frame(frame):
+    """
+    Render frame in a worker process of pool and save it as png image.
+
+    Args:
+        frame (tuple): (labels, colors, title, file name).
+
+    Returns
+    -------
+        None.
+
+    """
+    labels, colors, title, file_name = frame
+    worker_renderer.render(labels, colors, title).save(file_name)
+
+
+def render_frame(frame):
+    """
+    Render frame in a worker process of pool.
+
+    Args:
+        frame (tuple): (labels, colors, title).
+
+    Returns
+    -------
+        numpy.ndarray: (height, width, 3) uint8 RGB image.
+
+    """
+    return np.asarray(worker_renderer.render(*frame))
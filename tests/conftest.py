@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Makes modules of repository importable in tests.
+
+Run from root folder of repository:
+    python -m pytest tests
+
+Created on Sat Oct 17 02:41:19 2026
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Checks keys of cached clusters and isolation of cached arrays.
+
+Created on Sat Oct 17 03:01:57 2026
+"""
+from benchmarks import synthetic
+from clust.cache import LabelsCache
+from clust.clusters_builder import ClustersBuilder
+import numpy as np
+from scipy import sparse
+
+
+def test_settings_that_change_clusters_change_key():
+    loader = synthetic.get_loader_class(2).from_frame(
+        synthetic.make_frame(50, seed=2))
+    other_loader = synthetic.get_loader_class(2).from_frame(
+        synthetic.make_frame(50, seed=3))
+    ids = np.array(loader.unit_ids)
+    chain = sparse.eye(ids.shape[0], k=1, format='csr')
+    star = sparse.csr_matrix(
+        (np.ones(ids.shape[0]-1), (np.zeros(ids.shape[0]-1, dtype=int),
+                                   np.arange(1, ids.shape[0]))),
+        shape=(ids.shape[0], ids.shape[0]))
+    builders = [
+        ClustersBuilder(loader),
+        ClustersBuilder(other_loader),
+        ClustersBuilder(synthetic.get_loader_class(3).from_frame(
+            synthetic.make_frame(50, n_features=3, seed=2))),
+        ClustersBuilder(loader, mu=5),
+        ClustersBuilder(loader, ratio_threshold=2.5),
+        ClustersBuilder(loader, mst_backend='delaunay'),
+        ClustersBuilder(loader, mst_backend='knn'),
+        ClustersBuilder(loader, mst_backend='knn', knn_k=5),
+        ClustersBuilder(loader, mst_backend='adjacency',
+                        adjacency=(ids, chain)),
+        ClustersBuilder(loader, mst_backend='adjacency',
+                        adjacency=(ids, star))]
+    date = format(loader.dates[-1], loader.DATE_FORMAT)
+    keys = [str(builder.get_cache_key(date)) for builder in builders]
+    assert len(set(keys)) == len(keys)
+    keys = [str(builder.get_cache_key(date, n_clusters))
+            for builder in builders[:3] + builders[5:]
+            for n_clusters in [2, 3]]
+    assert len(set(keys)) == len(keys)
+    assert builders[0].get_cache_key(date) != \
+        builders[0].get_cache_key(format(loader.dates[0],
+                                         loader.DATE_FORMAT))
+    assert ClustersBuilder(loader).get_cache_key(date) == \
+        builders[0].get_cache_key(date)
+
+
+def test_cached_arrays_are_not_shared(tmp_path):
+    cache = LabelsCache(str(tmp_path))
+    ids, labels = np.array(['A', 'B']), np.array([0, 1])
+    cache.put(['key'], ids, labels)
+    labels[0] = 5
+    cached = cache.get(['key'])[1]
+    cached[1] = 7
+    assert cache.get(['key'])[1].tolist() == [0, 1]
+    cache.memory.clear()
+    cache.get(['key'])[1][0] = 3
+    assert cache.get(['key'])[1].tolist() == [0, 1]
+
+
+def test_adjacency_is_hashed_once(monkeypatch):
+    loader = synthetic.get_loader_class(2).from_frame(
+        synthetic.make_frame(20, seed=2))
+    ids = np.array(loader.unit_ids)
+    builder = ClustersBuilder(loader, mst_backend='adjacency', adjacency=(
+        ids, sparse.eye(ids.shape[0], k=1, format='csr')))
+    key = builder.get_cache_key('01.03.20')
+    monkeypatch.setattr('clust.clusters_builder.get_adjacency_hash', None)
+    assert builder.get_cache_key('01.03.20') == key
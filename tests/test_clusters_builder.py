@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Checks clusters built by ClustersBuilder.
+
+Created on Sat Oct 17 02:51:43 2026
+"""
+from benchmarks import synthetic
+from clust.cache import LabelsCache
+from clust.clusters_builder import ClustersBuilder, labels_to_clusters
+import geo_cache
+import numpy as np
+
+
+def make_builder(tmp_path, n_units=400, n_missing=20):
+    loader = synthetic.get_loader_class(2).from_frame(
+        synthetic.make_frame(n_units, seed=3, missing_ratio=0))
+    ids = np.array(loader.unit_ids)
+    path = str(tmp_path / 'geometry.npz')
+    geo_cache.save_geometry(synthetic.make_geo_json(ids[n_missing:]),
+                            'geoid', 'geoid', path, 'synthetic')
+    adjacency = geo_cache.load_adjacency(path, 'synthetic')
+    date = format(loader.dates[-1], loader.DATE_FORMAT)
+    return ClustersBuilder(loader, mst_backend='adjacency',
+                           adjacency=adjacency), date, set(ids[:n_missing])
+
+
+def test_units_without_geometry_are_not_clustered(tmp_path):
+    builder, date, missing = make_builder(tmp_path)
+    ids, labels = builder.get_labels(date, n_clusters=5)
+    assert set(ids[labels == -1]) == missing
+    assert set(labels[labels >= 0]) == set(range(5))
+    clusters = labels_to_clusters(ids, labels)
+    assert len(clusters) == 5
+    assert not missing & set().union(*clusters)
+
+
+def test_sweep_local_leaves_out_units_without_geometry(tmp_path):
+    builder, date, missing = make_builder(tmp_path)
+    n_clusters, labels = builder.sweep_local(date, [10], [5])
+    ids = builder.loader.extract_data(date)[builder.loader.ID_COLUMN]
+    assert set(ids[labels[0, 0] == -1]) == missing
+    assert n_clusters[0, 0] == labels[0, 0].max() + 1
+
+
+def test_incremental_labels_are_not_cached(tmp_path):
+    loader = synthetic.get_loader_class(2).from_frame(
+        synthetic.make_frame(300, n_dates=3, seed=1))
+    dates = [format(date, loader.DATE_FORMAT) for date in loader.dates]
+    cache = LabelsCache(str(tmp_path / 'cache'))
+    builder = ClustersBuilder(loader, incremental=True, cache=cache)
+    builder.get_labels_range(dates)
+    builder.get_labels_range(dates, workers=2)
+    assert not cache.memory and cache.hits + cache.misses == 0
+
+
+def test_labels_to_clusters_without_units():
+    assert labels_to_clusters(np.array([]), np.array([], dtype=int)) == []
+    assert labels_to_clusters(np.array(['A']), np.array([-1])) == []
+    assert labels_to_clusters(np.array(['A', 'B', 'C']),
+                              np.array([1, -1, 0])) == [{'C'}, {'A'}]
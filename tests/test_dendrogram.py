@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Checks Dendrogram against scipy.cluster.hierarchy.
+
+Created on Sat Oct 17 02:41:36 2026
+"""
+from clust.clusters_builder import get_edge_list, normalize_data
+from clust.dendrogram import Dendrogram
+from clust.graphs import MST
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import pdist
+
+
+def canonical(labels):
+    """Renumber clusters in order of their smallest data points."""
+    _, first, inverse = np.unique(labels, return_index=True,
+                                  return_inverse=True)
+    rank = np.empty_like(first)
+    rank[np.argsort(first)] = np.arange(first.shape[0])
+    return rank[inverse]
+
+
+def get_features(seed, n_vert=120):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.normal(size=(n_vert//2, 2)),
+                           rng.normal(size=(n_vert-n_vert//2, 2))*3 + 5])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_labels_match_fcluster(seed):
+    features = get_features(seed)
+    data_norm = normalize_data(pd.DataFrame(features))
+    dendrogram = Dendrogram(MST(get_edge_list(data_norm), len(features)),
+                            len(features))
+    linkage_matrix = linkage(pdist(data_norm.values), method='single')
+    assert np.allclose(dendrogram.linkage[:, 2], linkage_matrix[:, 2])
+    for n_clusters in [1, 2, 3, 7, 20, len(features)]:
+        expected = fcluster(linkage_matrix, n_clusters, criterion='maxclust')
+        labels = dendrogram.labels(n_clusters)
+        assert labels.max()+1 == n_clusters
+        assert np.array_equal(labels, canonical(expected))
+    for distance in np.quantile(linkage_matrix[:, 2], [0, 0.5, 0.9, 0.99]):
+        expected = fcluster(linkage_matrix, distance, criterion='distance')
+        labels = dendrogram.labels(distance=distance)
+        assert np.array_equal(labels, canonical(expected))
+
+
+def test_forest_labels():
+    features = get_features(0, 40)
+    data_norm = normalize_data(pd.DataFrame(features))
+    tree = MST(get_edge_list(data_norm), len(features))
+    dendrogram = Dendrogram(tree[:-3], len(features))
+    assert dendrogram.labels(1).max()+1 == 4
+    assert np.array_equal(dendrogram.labels(6),
+                          Dendrogram(tree, len(features)).labels(6))
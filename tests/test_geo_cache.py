@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that cached boundaries of neighbouring units stay shared.
+
+Created on Sat Oct 17 02:46:19 2026
+"""
+import collections
+import geo_cache
+import numpy as np
+
+
+def make_geo_json(n_side=6, n_points=80, seed=0):
+    """Grid of units whose shared borders are random walks."""
+    rng = np.random.default_rng(seed)
+    borders = dict()
+
+    def border(start, end):
+        key = (start, end) if start < end else (end, start)
+        if key not in borders:
+            steps = np.linspace(0, 1, n_points)[:, None]
+            line = np.array(key[0]) + np.subtract(key[1], key[0])*steps
+            walk = np.cumsum(rng.normal(size=n_points)) * 1e-4
+            walk -= np.linspace(walk[0], walk[-1], n_points)
+            normal = np.subtract(key[1], key[0])[::-1] * [-1, 1]
+            borders[key] = line + walk[:, None]*normal
+        return borders[key] if key == (start, end) else borders[key][::-1]
+
+    features = []
+    for i in range(n_side):
+        for j in range(n_side):
+            corners = [(i, j), (i+1, j), (i+1, j+1), (i, j+1), (i, j)]
+            ring = np.concatenate(
+                [border(corners[k], corners[k+1])[:-1] for k in range(4)] +
+                [[corners[0]]])
+            features.append({
+                'type': 'Feature',
+                'properties': {'geoid': i*n_side+j, 'name': str(i*n_side+j)},
+                'geometry': {'type': 'Polygon',
+                             'coordinates': [ring.tolist()]}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def count_segments(geo_json):
+    counts = collections.Counter()
+    for feature in geo_json['features']:
+        for polygon in geo_cache.get_polygons(feature['geometry']):
+            for ring in polygon:
+                points = [tuple(point) for point in ring]
+                for segment in zip(points[:-1], points[1:]):
+                    counts[tuple(sorted(segment))] += 1
+    return counts
+
+
+def test_simplified_borders_stay_shared(tmp_path):
+    n_side = 6
+    geo_json = make_geo_json(n_side)
+    path = str(tmp_path / 'geometry.npz')
+    geo_cache.save_geometry(geo_json, 'geoid', 'name', path, 'test',
+                            min_area=50)
+    result = geo_cache.load_geometry(path, 'geoid', 'name', 'test')
+    n_before = sum(len(feature['geometry']['coordinates'][0])
+                   for feature in geo_json['features'])
+    counts = count_segments(result)
+    assert sum(counts.values()) < 0.9*n_before
+    assert max(counts.values()) == 2
+    outer = np.array([point for segment, count in counts.items()
+                      if count == 1 for point in segment])
+    distance = np.minimum(np.minimum(outer, n_side - outer).min(axis=1),
+                          n_side)
+    assert distance.max() < 0.01
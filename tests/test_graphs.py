@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Checks approximate minimum spanning trees against exact ones.
+
+Created on Sat Oct 17 02:49:21 2026
+"""
+from clust.graphs import MST_delaunay, MST_knn, get_bridging_edges
+import numpy as np
+
+
+def test_knn_with_duplicates_is_spanning():
+    features = np.random.default_rng(0).normal(size=(2000, 2)).round(1)
+    tree = MST_knn(features, k=5)
+    exact = MST_delaunay(features)
+    assert tree.shape[0] == features.shape[0] - 1
+    assert np.isclose(tree['weight'].sum(), exact['weight'].sum())
+
+
+def test_bridging_edges_join_all_components():
+    features = np.random.default_rng(1).normal(size=(500, 2))
+    labels = np.repeat(np.arange(50), 10)
+    bridges = get_bridging_edges(features, labels, max_query=8)
+    assert bridges.shape[0] == 49
+    joined = labels.copy()
+    for edge in bridges:
+        joined[joined == joined[edge['to_vert']]] = joined[edge['from_vert']]
+    assert np.unique(joined).shape[0] == 1
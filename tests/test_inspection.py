@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Checks vectorized Inspector against per-edge is_consistent.
+
+Created on Sat Oct 17 02:41:19 2026
+"""
+from clust.clusters_builder import get_edge_list, normalize_data
+from clust.edges import make_edges
+from clust.graphs import MST
+from clust.inspection import Inspector, is_consistent
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def get_tree(seed, n_vert, integer):
+    """Build MST on random data, integer data gives many ties of weights."""
+    rng = np.random.default_rng(seed)
+    if integer:
+        features = rng.poisson(3, size=(n_vert, 3)).astype(np.float64)
+    else:
+        features = np.concatenate([rng.normal(size=(n_vert//2, 3)),
+                                   rng.normal(size=(n_vert-n_vert//2, 3))*4])
+    data_norm = normalize_data(pd.DataFrame(features))
+    return MST(get_edge_list(data_norm), n_vert)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('integer', [False, True])
+def test_sweep_local_matches_is_consistent(seed, integer):
+    mu_list, ratio_list = [0.5, 1, 2, 5, 10], [1, 1.5, 2.5, 5]
+    inspector = Inspector(get_tree(seed, 150, integer))
+    keep = inspector.sweep_local(mu_list, ratio_list)
+    edge_dict = inspector.get_dict()
+    for i, mu in enumerate(mu_list):
+        for j, ratio in enumerate(ratio_list):
+            expected = [is_consistent(edge_dict, edge, mu, ratio)
+                        for edge in inspector.edge_list]
+            assert keep[i, j].tolist() == expected
+
+
+def test_delete_edges_local_on_forest():
+    edge_list = get_tree(0, 60, False)
+    forest = edge_list[edge_list['weight'] < np.median(edge_list['weight'])]
+    inspector = Inspector(forest, n_vert=60)
+    edge_dict = inspector.get_dict()
+    expected = [edge for edge in inspector.edge_list
+                if is_consistent(edge_dict, edge, 1, 1.5)]
+    result = inspector.delete_edges_local(mu=1, ratio_threshold=1.5)
+    assert result.tolist() == [tuple(edge) for edge in expected]
+
+
+def test_zero_weights_are_not_rechecked(monkeypatch):
+    n_vert = 40
+    weights = np.zeros(n_vert-1)
+    weights[-1] = 1
+    star = make_edges(np.zeros(n_vert-1, dtype=int), np.arange(1, n_vert),
+                      weights)
+    inspector = Inspector(star)
+    edge_dict = inspector.get_dict()
+    expected = [[is_consistent(edge_dict, edge, mu, ratio)
+                 for edge in inspector.edge_list]
+                for mu, ratio in [(5, 2.5), (10, 5)]]
+    calls = []
+    monkeypatch.setattr('clust.inspection.is_consistent',
+                        lambda *args: calls.append(args))
+    keep = inspector.sweep_local([5, 10], [2.5, 5])
+    assert not calls
+    assert [keep[0, 0].tolist(), keep[1, 1].tolist()] == expected
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that loaders built from frames are set up as loaders built from files.
+
+Created on Sat Oct 17 03:03:31 2026
+"""
+from loader import LoaderUS
+import numpy as np
+import pandas as pd
+
+
+def make_frame():
+    rng = np.random.default_rng(0)
+    frames = []
+    for day in range(1, 11):
+        frames.append(pd.DataFrame({
+            'UID': np.arange(5) + 84000000, 'Date': '3/{}/20'.format(day),
+            'Confirmed': rng.integers(0, 3, size=5).cumsum() + day*10,
+            'Deaths': rng.integers(0, 2, size=5).cumsum() + day}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_from_frame_sets_up_subclass(tmp_path):
+    frame = make_frame()
+    info_file = str(tmp_path / 'usa.csv')
+    frame.to_csv(info_file, index=False)
+    loader_class = type('LoaderUSFile', (LoaderUS,), {
+        'INFO_FILE': info_file, 'CACHE_FOLDER': str(tmp_path / 'cache')})
+    from_file = loader_class(window=3)
+    from_frame = loader_class.from_frame(frame, window=3)
+    assert from_frame.window == 3
+    assert from_frame.get_data_key()[-1] == 3
+    for date in ['05.03.20', '10.03.20']:
+        pd.testing.assert_frame_equal(from_frame.extract_data(date),
+                                      from_file.extract_data(date))
+    assert from_frame.extract_data('02.03.20').shape[0] == 0
+    assert loader_class.from_frame(frame).window == 7
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that Profiler keeps stages consistent when a stage fails.
+
+Created on Sat Oct 17 02:47:55 2026
+"""
+from clust.profiling import Profiler
+import pytest
+
+
+def test_failed_stage_pops_peak():
+    profiler = Profiler(memory=True)
+    with profiler.stage('outer'):
+        with pytest.raises(RuntimeError):
+            with profiler.stage('inner'):
+                block = bytearray(10**6)
+                raise RuntimeError
+        del block
+    assert profiler.peaks == []
+    records = profiler.pop_records()
+    assert [record['stage'] for record in records] == ['outer']
+    assert records[0]['peak_bytes'] >= 10**6
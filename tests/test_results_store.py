@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Checks round trips of ResultsStore.
+
+Created on Sat Oct 17 02:43:34 2026
+"""
+from clust.clusters_builder import write_labels
+from clust.results_store import RECORD_DTYPE_V1, ResultsStore
+import json
+import numpy as np
+
+
+def test_from_csv_keeps_first_row(tmp_path):
+    ids = np.array(['A', 'B', 'C'])
+    csv_file = str(tmp_path / 'clust.csv')
+    write_labels(ids, np.array([1, 0, 1]), '01.02.20', csv_file)
+    write_labels(ids, np.array([0, 0, 1]), '02.02.20', csv_file)
+    store = ResultsStore.from_csv(csv_file, str(tmp_path / 'clust.bin'))
+    read_ids, labels = store.read('01.02.20')
+    assert dict(zip(read_ids, labels)) == {'A': 1, 'B': 0, 'C': 1}
+    assert len(store.read('02.02.20')[0]) == 3
+
+
+def test_from_csv_skips_header(tmp_path):
+    csv_file = tmp_path / 'clust.csv'
+    csv_file.write_text('",id,Cluster id,Date"\n0,Burma,1,22.01.20\n'
+                        '1,Tajikistan,2,22.01.20\n')
+    store = ResultsStore.from_csv(str(csv_file), str(tmp_path / 'clust.bin'))
+    ids, labels = store.read('22.01.20')
+    assert ids.tolist() == ['Burma', 'Tajikistan']
+    assert labels.tolist() == [0, 1]
+
+
+def test_many_clusters(tmp_path):
+    file_name = str(tmp_path / 'clust.bin')
+    labels = np.arange(-1, 1000)
+    with ResultsStore(file_name) as store:
+        store.append('01.02.20', np.arange(labels.shape[0]), labels)
+    assert ResultsStore(file_name).read('01.02.20')[1].tolist() == \
+        labels.tolist()
+
+
+def test_reads_version_1(tmp_path):
+    file_name = str(tmp_path / 'clust.bin')
+    records = np.zeros(2, dtype=RECORD_DTYPE_V1)
+    records['unit'], records['cluster'] = [1, 0], [3, -1]
+    records.tofile(file_name)
+    with open(file_name + '.json', 'w') as index_file:
+        json.dump({'unit_ids': ['A', 'B'], 'dates': ['01.02.20'],
+                   'offsets': [[0, 2]]}, index_file)
+    store = ResultsStore(file_name)
+    store.append('02.02.20', np.array(['A']), np.array([5]))
+    store.flush()
+    store = ResultsStore(file_name)
+    assert store.read('01.02.20')[0].tolist() == ['B', 'A']
+    assert store.read('01.02.20')[1].tolist() == [3, -1]
+    assert store.read('02.02.20')[1].tolist() == [5]
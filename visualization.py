@@ -6,15 +6,21 @@ Created on Sat Aug 15 19:39:51 2020
 
 @author: Anna Kravets
 """
+import base64
 import branca
+from clust.results_store import ResultsStore
 import folium
+import geo_cache
+from jinja2 import Template
 import json
 import loader
 from datetime import datetime as dt
 from datetime import timedelta
-import selenium.webdriver
+import numpy as np
+import os
 import requests
 import pandas as pd
+import rendering
 
 
 class MapBuilder:
@@ -31,6 +37,14 @@ class MapBuilder:
             name of column for storing clusters' id.
         n_clust:
             number of clusters.
+        results:
+            clust.ResultsStore with clusters built for each date.
+        feature_ids:
+            pandas.Index with id_json property of each GeoJson feature, is
+            used to join features with rows of data.
+        renderer:
+            rendering.FrameRenderer with projected boundaries, is built on
+            first call of get_renderer.
     """
 
     def __init__(self):
@@ -43,7 +57,71 @@ class MapBuilder:
 
         """
         self.geo_json = self.load_geo_json()
+        self.feature_ids = pd.Index([
+            feature['properties'][self.id_json]
+            for feature in self.geo_json['features']])
         self.clust_column = 'Cluster id'
+        self.results = self.load_results()
+        self.renderer = None
+
+    def load_geo_json(self):
+        """
+        Load boundaries of admin units from geometry cache.
+
+        Cache is built from read_geo_json on first use and rebuilt when
+        get_geo_source changes, geometry is quantized and simplified (see
+        geo_cache), features keep only id_json and name_json properties.
+
+        Returns
+        -------
+            geo_json (dict): GeoJson data with boundaries of admin units.
+
+        """
+        path = geo_cache.get_cache_path(type(self).__name__)
+        source = self.get_geo_source()
+        geo_json = geo_cache.load_geometry(path, self.id_json,
+                                           self.name_json, source)
+        if geo_json is None:
+            geo_cache.save_geometry(self.read_geo_json(), self.id_json,
+                                    self.name_json, path, source)
+            geo_json = geo_cache.load_geometry(path, self.id_json,
+                                               self.name_json, source)
+        return geo_json
+
+    def get_adjacency(self):
+        """
+        Get adjacency of admin units, as stored in geometry cache.
+
+        Units are adjacent if their boundaries share a segment (touching at
+        a single point is not enough), features with the same id_json are
+        merged in one unit. Result could be passed to clust.ClustersBuilder
+        for 'adjacency' MST backend.
+
+        Returns
+        -------
+            unit_ids (numpy.ndarray): sorted unique ids of admin units that
+            have geometry.
+            adjacency (scipy.sparse.csr_matrix): (n_units, n_units) matrix,
+            nonzero for adjacent units.
+
+        """
+        return geo_cache.load_adjacency(
+            geo_cache.get_cache_path(type(self).__name__),
+            self.get_geo_source())
+
+    def load_results(self):
+        """
+        Open store with clusters, convert csv results to store if needed.
+
+        Returns
+        -------
+            clust.ResultsStore: store with clusters built for each date.
+
+        """
+        csv_file = os.path.splitext(self.file_clust)[0] + '.csv'
+        if not os.path.exists(self.file_clust) and os.path.exists(csv_file):
+            return ResultsStore.from_csv(csv_file, self.file_clust)
+        return ResultsStore(self.file_clust)
 
     def get_color(self, feature):
         """
@@ -78,13 +156,14 @@ class MapBuilder:
             None.
 
         """
-        for i in range(len(self.geo_json['features'])):
-            id_ = self.geo_json['features'][i]['properties'][self.id_json]
-            for name in self.column_list + [self.clust_column]:
-                self.geo_json['features'][i]['properties'][name] = 0
-                if id_ in data.index.values:
-                    self.geo_json['features'][i]['properties'][name] =\
-                        int(data.loc[id_][name])
+        names = self.column_list + [self.clust_column]
+        rows = data.index.get_indexer(self.feature_ids)
+        # row of zeros is appended for features without data (row -1)
+        values = np.concatenate([data[names].to_numpy(dtype=np.float64),
+                                 np.zeros((1, len(names)))])
+        values = values[rows].astype(np.int64)
+        for feature, row in zip(self.geo_json['features'], values.tolist()):
+            feature['properties'].update(zip(names, row))
 
     def save_map_impl(self, date: str):
         """
@@ -119,12 +198,34 @@ class MapBuilder:
 
         map_.save(self.map_folder+'/'+date+'.html')
 
+    def add_title(self, map_: folium.Map, date: str):
+        """
+        Add title returned by get_title to the map.
+
+        Args:
+            map_ (folium.Map).
+            date (str).
+
+        Returns
+        -------
+            None.
+
+        """
+        title_html = '''<head><style> html { overflow-y: hidden; }
+                </style></head>
+                '''
+        title_html += '''<h1 align="center"><b>{}</b></h3>'''.format(
+            self.get_title(date))
+        map_.get_root().html.add_child(folium.Element(title_html))
+
     def save_map(self, builder, date: str):
         """
         Save map with colored clusters built for given date.
 
+        Clusters are read from self.results.
+
         Args:
-            builder (clust.ClustersBuilder): is used to get clusters.
+            builder (clust.ClustersBuilder): is used to get data.
             date (str): for this date clusters are built.
 
         Returns
@@ -132,39 +233,167 @@ class MapBuilder:
             None.
 
         """
-        df = self.df[self.df['Date'] == date]
+        ids, labels = self.results.read(date)
         data = builder.loader.extract_data(date)
         data = data.set_index(self.id_df)
-        df = df.set_index('id')
-        data[self.clust_column] = 0
-        self.n_clust = len(set(df[self.clust_column].values))
-        for id_ in df.index:
-            data.loc[id_, self.clust_column] = df.loc[id_, self.clust_column]
+        clusters = pd.Series(labels.astype(np.int64)+1, index=ids)
+        data[self.clust_column] = clusters.reindex(data.index, fill_value=0)
+        self.n_clust = int(labels.max(initial=-1)) + 1
         self.modify_geo_json(data)
         self.save_map_impl(date)
 
-    def save_as_img(self, dates):
+    def get_feature_labels(self, date: str, result=None):
+        """
+        Get cluster id of each GeoJson feature on given date.
+
+        Args:
+            date (str): for this date clusters have been built.
+            result (tuple, optional): (ids, labels) returned by
+                ClustersBuilder.get_labels. Defaults to None (clusters are
+                read from self.results).
+
+        Returns
+        -------
+            numpy.ndarray: int16 cluster id (starting from 1, 0 for admin
+            units without clusters) for each feature in self.feature_ids.
+
         """
-        Save screenshot of webpages containing maps for particular dates.
+        ids, labels = result or self.results.read(date)
+        clusters = pd.Series(labels.astype(np.int16)+1, index=ids)
+        return clusters.reindex(self.feature_ids, fill_value=0).to_numpy(
+            dtype=np.int16)
+
+    def save_map_range(self, dates, file_name=None):
+        """
+        Save one html page with clusters for all given dates.
+
+        Boundaries of admin units are embedded once, clusters for each date
+        are embedded as base64 encoded Int16Array (two bytes per admin unit)
+        and are switched by a slider in browser.
+
+        Args:
+            dates (list): dates for which clusters are shown.
+            file_name (str, optional): path of html page. Defaults to None
+                (map_folder/animation.html).
+
+        Returns
+        -------
+            None.
+
+        """
+        labels = np.stack([self.get_feature_labels(date) for date in dates])
+        self.n_clust = int(labels.max(initial=0))
+        self.colorscale = create_colorscale(self.n_clust)
+        colors = get_colors(self.n_clust)
+        geo_json = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': feature['geometry'],
+             'properties': {self.name_json:
+                            feature['properties'][self.name_json],
+                            'map_index': i}}
+            for i, feature in enumerate(self.geo_json['features'])]}
+
+        map_ = folium.Map(**self.map_args)
+        layer = folium.GeoJson(
+            geo_json,
+            style_function=lambda feature: {
+                'fillColor': colors[
+                    labels[0, feature['properties']['map_index']]],
+                'fillOpacity': 1,
+                'color': 'black',
+                'weight': 0.2
+                },
+            name='COVID CLUSTERS',
+            tooltip=folium.features.GeoJsonTooltip(
+                fields=[self.name_json], aliases=['Name'])
+            ).add_to(map_)
+        map_.add_child(self.colorscale)
+        map_.add_child(TimeSlider(
+            layer, [self.get_title(date) for date in dates],
+            [base64.b64encode(row.astype('<i2').tobytes()).decode()
+             for row in labels],
+            colors))
+        map_.save(file_name or self.map_folder+'/animation.html')
+
+    def save_as_img(self, dates, workers=1):
+        """
+        Save images with colored clusters for particular dates.
+
+        Images are drawn without a browser by rendering.FrameRenderer,
+        boundaries are projected once and shared by processes of pool.
 
         Args:
             dates (list): stores dates to save images for.
+            workers (int, optional): # of processes. Defaults to 1 (no pool).
 
         Returns
         -------
             None.
 
         """
-        driver = selenium.webdriver.Chrome()
-        driver.set_window_size(1250, 800)  # 1250, 800 for US, 1100, 900 otherw
+        frames = []
         for date in dates:
-            driver.get(
-                "file:///C:/Users/DELL/Covid_clusters/"+
-                self.map_folder+"/"+date+".html"
-                )
-            driver.save_screenshot(self.img_folder+'/'+date+'.png')
-            print(date)
-        driver.quit()
+            labels = self.get_feature_labels(date)
+            frames.append((labels, get_colors(int(labels.max(initial=0))),
+                           self.get_title(date),
+                           os.path.join(self.img_folder, date+'.png')))
+        os.makedirs(self.img_folder, exist_ok=True)
+        rendering.save_frames(self.get_renderer(), frames, workers)
+
+    def save_animation(self, dates, file_name=None, builder=None, delay=200,
+                       workers=1):
+        """
+        Save animated png with colored clusters for given dates.
+
+        Frames are rendered (by a pool of processes) and written to file one
+        by one, no html pages or images are saved for separate dates.
+
+        Args:
+            dates (list): dates of frames.
+            file_name (str, optional): path of .png file. Defaults to None
+                (img_folder/animation.png).
+            builder (clust.ClustersBuilder, optional): if given, clusters
+                are built by builder instead of being read from
+                self.results. Defaults to None.
+            delay (int, optional): duration of frame in milliseconds.
+                Defaults to 200.
+            workers (int, optional): # of processes. Defaults to 1 (no pool).
+
+        Returns
+        -------
+            None.
+
+        """
+        results = [None]*len(dates) if builder is None else \
+            builder.get_labels_range(dates, workers=workers)
+        labels = [self.get_feature_labels(date, result)
+                  for date, result in zip(dates, results)]
+        colors = get_colors(int(max(row.max(initial=0) for row in labels)))
+        frames = ((row, colors, self.get_title(date))
+                  for date, row in zip(dates, labels))
+        file_name = file_name or os.path.join(self.img_folder,
+                                              'animation.png')
+        folder = os.path.dirname(file_name)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with rendering.APNGWriter(file_name, self.IMG_SIZE,
+                                  delay) as writer:
+            for image in rendering.render_frames(self.get_renderer(), frames,
+                                                 workers):
+                writer.append(image)
+
+    def get_renderer(self):
+        """
+        Get renderer with projected boundaries, build it on first call.
+
+        Returns
+        -------
+            rendering.FrameRenderer: draws images of size IMG_SIZE.
+
+        """
+        if self.renderer is None:
+            self.renderer = rendering.FrameRenderer(
+                self.geo_json, self.IMG_SIZE, self.IMG_BOUNDS)
+        return self.renderer
 
 
 class MapBuilderUS(MapBuilder):
@@ -175,10 +404,19 @@ class MapBuilderUS(MapBuilder):
 
     """
 
-    def __init__(self):
+    FILE_CLUST = 'results/usa_clust.bin'
+    IMG_SIZE = (1250, 800)
+    IMG_BOUNDS = ((24, -125), (50, -66))
+    GEO_FILE = 'data/us-county-boundaries.geojson'
+
+    def __init__(self, file_clust=None):
         """
         Set up specific fields for data processing, folder names, load GeoJson.
 
+        Args:
+            file_clust (str, optional): path of clust.ResultsStore with
+                clusters. Defaults to None (FILE_CLUST).
+
         Returns
         -------
             None.
@@ -192,24 +430,35 @@ class MapBuilderUS(MapBuilder):
         self.img_folder = 'pictures_us'
         self.map_args = {'location': [36, -97], 'zoomSnap': 0.25,
                          'zoom_start': 4.75, 'zoom_control': False}
-        self.file_clust = 'results/usa_clust.csv'
-        self.df = pd.read_csv(self.file_clust)
+        self.file_clust = file_clust or self.FILE_CLUST
 
         MapBuilder.__init__(self)
 
-    def load_geo_json(self):
+    def get_geo_source(self):
         """
-        Load counties' boundaries.
+        Get string that identifies current version of GEO_FILE.
 
         Returns
         -------
-            geo_json (dict): GeoJson data with boundaries of countries.
+            str: path, size and mtime of GEO_FILE.
+
+        """
+        stat = os.stat(self.GEO_FILE)
+        return '{}:{}:{}'.format(os.path.abspath(self.GEO_FILE),
+                                 stat.st_size, stat.st_mtime_ns)
+
+    def read_geo_json(self):
+        """
+        Read counties' boundaries from GEO_FILE, set ids as in loader.
+
+        Returns
+        -------
+            geo_json (dict): GeoJson data with boundaries of US counties.
 
         """
         id_NY_list = ['36005', '36081', '36047', '36085']
         NY_id = '36061'
-        path = 'data/us-county-boundaries.geojson'
-        with open(path) as boundaries:
+        with open(self.GEO_FILE) as boundaries:
             geo_json = json.load(boundaries)
             for i in range(len(geo_json['features'])):
                 id_ = geo_json['features'][i]['properties'][self.id_json]
@@ -219,28 +468,23 @@ class MapBuilderUS(MapBuilder):
                     int('840'+id_)
             return geo_json
 
-    def add_title(self, map_: folium.Map, date: str):
+    def get_title(self, date: str):
         """
-        Add title showing week start and end date to the map.
+        Get title showing week start and end date.
 
         Args:
-            map_ (folium.Map).
             date (str): start of the following week.
 
         Returns
         -------
-            None.
+            str: title of map.
 
         """
-        title_html = '''<head><style> html { overflow-y: hidden; }
-                </style></head>
-                '''
         date_prev = format(dt.strptime(date, loader.Loader.DATE_FORMAT) -
                            timedelta(days=7), '%d.%m')
         date = format(dt.strptime(date, loader.Loader.DATE_FORMAT), '%d.%m')
-        title_html += '''<h1 align="center"><b>{}-{}</b></h3>'''.format(
-            date_prev, date)
-        map_.get_root().html.add_child(folium.Element(title_html))
+        return '{}-{}'.format(date_prev, date)
+
 
 class MapBuilderCountries(MapBuilder):
     """
@@ -250,10 +494,29 @@ class MapBuilderCountries(MapBuilder):
 
     """
 
-    def __init__(self):
+    FILE_CLUST = 'results/countries_clust.bin'
+    IMG_SIZE = (1100, 900)
+    IMG_BOUNDS = ((-58, -170), (80, 180))
+    GEO_FILE = 'https://raw.githubusercontent.com/datasets/' + \
+        'geo-countries/master/data/countries.geojson'
+    NAME_DICT = {
+        'United States of America': 'US',
+        'Republic of the Congo': 'Congo (Kinshasa)',
+        'Democratic Republic of the Congo': 'Congo (Brazzaville)',
+        'Republic of Serbia': 'Serbia',
+        'Czech Republic': 'Czechia',
+        'Taiwan': 'Taiwan*',
+        'Macedonia': 'North Macedonia'
+        }
+
+    def __init__(self, file_clust=None):
         """
         Set up specific fields for data processing, folder names, load GeoJson.
 
+        Args:
+            file_clust (str, optional): path of clust.ResultsStore with
+                clusters. Defaults to None (FILE_CLUST).
+
         Returns
         -------
             None.
@@ -268,60 +531,142 @@ class MapBuilderCountries(MapBuilder):
         self.map_args = {'tiles': "cartodbpositron", 'zoom_start': 2,
                          'location': [40., 10.], 'zoom_control': False,
                          'max_bounds': True}
-        self.file_clust = 'results/countries_clust.csv'
-        self.df = pd.read_csv(self.file_clust)
+        self.file_clust = file_clust or self.FILE_CLUST
 
         MapBuilder.__init__(self)
 
-    def load_geo_json(self):
+    def get_geo_source(self):
         """
-        Load countries' boundaries.
+        Get string that identifies source of countries' boundaries.
 
         Returns
         -------
-            geo_json (dict): GeoJson data with boundaries of US counties.
+            str: url of GEO_FILE and NAME_DICT.
 
         """
-        country_shapes = 'https://raw.githubusercontent.com/datasets/' + \
-            'geo-countries/master/data/countries.geojson'
-        geo_json = json.loads(requests.get(country_shapes).text)
-        name_dict = {
-            'United States of America': 'US',
-            'Republic of the Congo': 'Congo (Kinshasa)',
-            'Democratic Republic of the Congo': 'Congo (Brazzaville)',
-            'Republic of Serbia': 'Serbia',
-            'Czech Republic': 'Czechia',
-            'Taiwan': 'Taiwan*',
-            'Macedonia': 'North Macedonia'
-            }
+        return json.dumps([self.GEO_FILE, self.NAME_DICT], sort_keys=True)
+
+    def read_geo_json(self):
+        """
+        Download countries' boundaries, set names as in loader.
+
+        Returns
+        -------
+            geo_json (dict): GeoJson data with boundaries of countries.
+
+        """
+        geo_json = json.loads(requests.get(self.GEO_FILE).text)
         for i in range(len(geo_json['features'])):
             id_ = geo_json['features'][i]['properties'][self.id_json]
-            if id_ in name_dict:
+            if id_ in self.NAME_DICT:
                 geo_json['features'][i]['properties'][self.id_json] = \
-                    name_dict[id_]
+                    self.NAME_DICT[id_]
         return geo_json
 
-    def add_title(self, map_: folium.Map, date: str):
+    def get_title(self, date: str):
         """
-        Add title showing date to the map.
+        Get title showing date.
 
         Args:
-            map_ (folium.Map).
             date (str).
 
+        Returns
+        -------
+            str: title of map.
+
+        """
+        return date
+
+
+class TimeSlider(branca.element.MacroElement):
+    """
+    Slider that switches colors of GeoJson layer between dates.
+
+    Attributes
+    ----------
+        layer: folium.GeoJson layer, feature i has property map_index=i.
+        titles: title of map for each date.
+        labels: base64 encoded little-endian Int16Array with cluster id of
+        each feature for each date.
+        colors: color for each cluster id.
+    """
+
+    _template = Template('''
+        {% macro html(this, kwargs) %}
+        <div id="{{ this.get_name() }}" style="position: fixed; top: 10px;
+            left: 50%; transform: translateX(-50%); z-index: 1000;
+            text-align: center; background: white; padding: 4px 12px;">
+            <h1 style="margin: 0;"><b></b></h1>
+            <input type="range" min="0" max="{{ this.titles|length - 1 }}"
+                value="0" step="1" style="width: 400px;">
+        </div>
+        {% endmacro %}
+
+        {% macro script(this, kwargs) %}
+        (function() {
+            var titles = {{ this.titles|tojson }};
+            var colors = {{ this.colors|tojson }};
+            var labels = {{ this.labels|tojson }}.map(function(encoded) {
+                var bytes = Uint8Array.from(atob(encoded), function(c) {
+                    return c.charCodeAt(0);
+                });
+                return new Int16Array(bytes.buffer);
+            });
+            var box = document.getElementById("{{ this.get_name() }}");
+            var title = box.getElementsByTagName("b")[0];
+            var slider = box.getElementsByTagName("input")[0];
+            function show(k) {
+                title.textContent = titles[k];
+                {{ this.layer.get_name() }}.eachLayer(function(layer) {
+                    var i = layer.feature.properties.map_index;
+                    layer.setStyle({fillColor: colors[labels[k][i]]});
+                });
+            }
+            slider.addEventListener("input", function() {
+                show(parseInt(slider.value));
+            });
+            show(0);
+        })();
+        {% endmacro %}
+        ''')
+
+    def __init__(self, layer, titles, labels, colors):
+        """
+        Store layer and data for each date.
+
+        Args:
+            layer (folium.GeoJson): layer with admin units.
+            titles (list): title of map for each date.
+            labels (list): base64 encoded cluster ids for each date.
+            colors (list): color for each cluster id.
+
         Returns
         -------
             None.
 
         """
-        title_html = '''<head><style> html { overflow-y: hidden; }
-                </style></head>
-                '''
-        title_html += '''<h1 align="center"><b>{}</b></h3>'''.format(date)
-        map_.get_root().html.add_child(folium.Element(title_html))
+        super().__init__()
+        self._name = 'TimeSlider'
+        self.layer = layer
+        self.titles = titles
+        self.labels = labels
+        self.colors = colors
 
 
+def get_colors(n):
+    """
+    Get color for each cluster id in [0,n], white for 0 (no cluster).
+
+    Args:
+        n (int): # of clusters.
 
+    Returns
+    -------
+        list: n+1 colors, as in create_colorscale(n).
+
+    """
+    colorscale = create_colorscale(n)
+    return ['#ffffff'] + [colorscale(i) for i in range(1, n+1)]
 
 
 def create_colorscale(n):